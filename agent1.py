@@ -1,10 +1,29 @@
 import os
+import re
+import gzip
+import html as htmllib
+import signal
+import socket
+import hashlib
+import sys
+import argparse
+import time
+import heapq
+import itertools
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
 from dotenv import load_dotenv
 import asyncpg
+import httpx
 from playwright.async_api import async_playwright
-from bs4 import BeautifulSoup
+from extract import parse_page
+from snapshots import save_snapshots, decompress, prune_snapshots
+from tracing import tracer
+import bm25
 from datetime import datetime
 
 load_dotenv()
@@ -17,78 +36,570 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT"),
 }
 
-BATCH_SIZE = 3
 TEXT_LIMIT = 30000
 MAX_PAGES = 8
 
+# -----------------------------
+# LINK FRONTIER
+# subpages are crawled best-first by how likely
+# they are to describe the candidate's work
+# -----------------------------
+MAX_DEPTH = 2                 # homepage links = 1, their links = 2
+PAGES_IN_FLIGHT = 4           # concurrent page fetches per portfolio
+
+# word runs at least this long that already appeared on an earlier
+# page of the same portfolio (nav, footer, contact block) are dropped
+SHINGLE_WORDS = 8
+# shorter runs (a one-line nav bar, a copyright footer) count when
+# an earlier page started or ended with the same EDGE_MIN_WORDS+ words
+EDGE_MIN_WORDS = 4
+EDGE_MAX_WORDS = 16
+# text from pages whose url scores at least SIGNAL_PAGE_SCORE (projects,
+# work, experience, resume, about...) is high-signal; the crawl stops
+# once that makes up most of the text budget
+SIGNAL_PAGE_SCORE = 5
+ENOUGH_SIGNAL_CHARS = TEXT_LIMIT * 2 // 3
+DEPTH_PENALTY = 4
+MIN_LINK_SCORE = -10          # legal/login/feed pages are never crawled
+
+# matched against anchor text and url path tokens
+LINK_PRIORITIES = {
+    "project": 10,
+    "projects": 10,
+    "work": 8,
+    "portfolio": 8,
+    "case": 6,
+    "experience": 9,
+    "resume": 8,
+    "cv": 8,
+    "about": 7,
+    "skills": 7,
+    "research": 5,
+    "publications": 4,
+    "talks": 3,
+    "blog": -3,
+    "posts": -3,
+    "tag": -6,
+    "tags": -6,
+    "category": -6,
+    "page": -4,
+    "archive": -6,
+    "privacy": -15,
+    "terms": -15,
+    "legal": -15,
+    "cookies": -15,
+    "imprint": -15,
+    "license": -10,
+    "login": -15,
+    "signup": -15,
+    "feed": -15,
+    "rss": -15,
+}
+
+# crawl engine shape: PROCESSES x CONTEXTS_PER_PROCESS portfolios in flight
+PROCESSES = 1
+CONTEXTS_PER_PROCESS = 3
+
+# recycle a browser context after this many pages (bounds chromium memory)
+PAGES_PER_CONTEXT = 40
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+VIEWPORT = {"width": 1400, "height": 900}
 
 # -----------------------------
-# CLEAN HTML (SAFE VERSION)
+# JOB LEASES
+# a claim expires unless its worker heartbeats;
+# expired claims go back to pending, and rows
+# that keep killing workers end up 'failed'
 # -----------------------------
-def clean_html(html):
-    soup = BeautifulSoup(html, "html.parser")
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 60
+REAP_SECONDS = 60
+MAX_ATTEMPTS = 3
+
+# all lease timestamps are naive UTC, like last_scraped
+NOW_UTC = "(NOW() AT TIME ZONE 'UTC')"
+
+# -----------------------------
+# DAEMON MODE
+# browsers stay warm; an insert trigger on portfolios
+# NOTIFYs this channel, a periodic sweep is the fallback
+# -----------------------------
+PENDING_CHANNEL = "portfolio_pending"
+SWEEP_SECONDS = 30
+
+# a slot whose DB work fails (dropped connection, Postgres
+# restart) backs off and retries instead of killing the
+# worker; one-shot runs give up after DB_MAX_FAILURES in a row
+DB_BACKOFF_SECONDS = 1
+DB_BACKOFF_MAX_SECONDS = 30
+DB_MAX_FAILURES = 5
+
+# -----------------------------
+# BM25 INDEX FEED (--bm25-index)
+# completed portfolios are added to the on-disk
+# index in batches, and whenever a slot goes idle
+# -----------------------------
+BM25_FLUSH_DOCS = 25
+
+# -----------------------------
+# RESOURCE BLOCKING
+# clean_html only keeps text, so heavy assets
+# and trackers are aborted before they load.
+# allow lists always win over block lists.
+# -----------------------------
+BLOCK_RESOURCE_TYPES = {"image", "media", "font"}
+ALLOW_RESOURCE_TYPES = {"document", "script", "xhr", "fetch"}
+
+BLOCK_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "connect.facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.io",
+    "cdn.segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "fullstory.com",
+    "plausible.io",
+    "static.cloudflareinsights.com",
+    "js.hs-scripts.com",
+    "js.hs-analytics.net",
+    "widget.intercom.io",
+]
+
+ALLOW_DOMAINS = []
+
+# rough transfer size per aborted request, used for the "bytes saved" estimate
+EST_BLOCKED_BYTES = {
+    "image": 80_000,
+    "media": 1_000_000,
+    "font": 40_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+}
+DEFAULT_EST_BLOCKED_BYTES = 10_000
+
+# -----------------------------
+# HTTP FAST PATH
+# static pages are fetched without a browser;
+# only JS shells escalate to playwright
+# -----------------------------
+HTTP_TIMEOUT = 15
+HTTP_MAX_CONNECTIONS = 20
+
+MIN_STATIC_TEXT = 300        # homepage visible chars below this -> JS shell
+MIN_TEXT_DENSITY = 0.01      # visible chars / html bytes
+
+# -----------------------------
+# ROBOTS.TXT + SITEMAP DISCOVERY
+# plain HTTP before any render: sitemap pages seed
+# the frontier, so the homepage renders alongside them
+# -----------------------------
+MAX_SITEMAPS = 3             # sitemap files read (index fan-out included)
+MAX_SITEMAP_URLS = 200       # locs handed to the frontier
+
+# a robots.txt Crawl-delay is honoured up to MAX_CRAWL_DELAY; when
+# MAX_PAGES fetches spaced that far apart would blow the per-portfolio
+# budget, only the homepage is crawled
+MAX_CRAWL_DELAY = 10
+CRAWL_DELAY_BUDGET_SECONDS = 60
+
+# -----------------------------
+# PAGE SCHEDULER
+# global cap on open tabs per process, plus
+# per-host politeness that backs off adaptively
+# -----------------------------
+MAX_OPEN_PAGES = 6
+PER_HOST_CONCURRENCY = 2
+HOST_MIN_INTERVAL = 0.25     # seconds between request starts on one host
+HOST_MAX_INTERVAL = 15
+SLOW_RESPONSE_SECONDS = 10
+BACKOFF_FACTOR = 2
+RECOVERY_FACTOR = 0.75
+
+# -----------------------------
+# ADAPTIVE WAITS
+# a page is "settled" once the DOM, its text and
+# the network have been quiet for SETTLE_QUIET_MS
+# -----------------------------
+SETTLE_QUIET_MS = 500
+SETTLE_MAX_MS = 8000          # upper bound for hydration
+SCROLL_SETTLE_MAX_MS = 2000   # upper bound per scroll step
+SETTLE_POLL_MS = 100
+MAX_SCROLL_STEPS = 20
+
+# the old fixed schedule, only used to log time saved
+FIXED_HYDRATION_MS = 5000
+FIXED_SCROLL_STEP_MS = 2000
+FIXED_POST_SCROLL_MS = 3000
 
-    # REMOVE ONLY TRUE JUNK
-    for tag in soup(["script", "style", "noscript"]):
-        tag.extract()
 
-    text = soup.get_text(separator=" ", strip=True)
+# -----------------------------
+# CLEAN HTML (SAFE VERSION)
+# (text only; use parse_page directly to
+#  get text + links from a single parse)
+# -----------------------------
+def clean_html(html):
+    text, _ = parse_page(html)
 
     return text
 
 
 # -----------------------------
-# STRONG AUTO SCROLL
-# (handles lazy + animated sites)
+# DOM QUIESCENCE DETECTOR
+# (injected before any page script runs)
 # -----------------------------
-async def auto_scroll(page):
-    previous_height = 0
+QUIESCENCE_JS = """
+(() => {
+    if (window.__quiet) return;
+    const state = { lastMutation: performance.now(), mutations: 0 };
+    window.__quiet = state;
+    new MutationObserver((records) => {
+        state.mutations += records.length;
+        state.lastMutation = performance.now();
+    }).observe(document, { childList: true, subtree: true, characterData: true });
+})();
+"""
+
+PROBE_JS = """
+() => ({
+    sinceMutation: window.__quiet
+        ? performance.now() - window.__quiet.lastMutation
+        : Infinity,
+    textLength: document.body ? document.body.textContent.length : 0,
+    height: document.body ? document.body.scrollHeight : 0
+})
+"""
+
+# never "finish", so they must not hold the page open
+LONG_LIVED_TYPES = {"websocket", "eventsource"}
+
+
+class NetworkTracker:
+
+    def __init__(self, page):
+        self.inflight = set()
+
+        page.on("request", self._started)
+        page.on("requestfinished", self._done)
+        page.on("requestfailed", self._done)
+
+    def _started(self, request):
+        if request.resource_type not in LONG_LIVED_TYPES:
+            self.inflight.add(request)
+
+    def _done(self, request):
+        self.inflight.discard(request)
+
+    @property
+    def pending(self):
+        return len(self.inflight)
+
+
+async def wait_for_settle(
+    page,
+    network,
+    max_ms=SETTLE_MAX_MS,
+    quiet_ms=SETTLE_QUIET_MS
+):
+
+    started = time.monotonic()
+    deadline = started + max_ms / 1000
+
+    last_length = -1
+    stable_since = started
 
     while True:
-        current_height = await page.evaluate(
-            "document.body.scrollHeight"
+
+        probe = await page.evaluate(PROBE_JS)
+        now = time.monotonic()
+
+        if probe["textLength"] != last_length:
+            last_length = probe["textLength"]
+            stable_since = now
+
+        settled = (
+            probe["sinceMutation"] >= quiet_ms
+            and (now - stable_since) * 1000 >= quiet_ms
+            and network.pending == 0
         )
 
-        if current_height == previous_height:
+        if settled or now >= deadline:
+            return probe, (now - started) * 1000
+
+        await asyncio.sleep(SETTLE_POLL_MS / 1000)
+
+
+# -----------------------------
+# STRONG AUTO SCROLL
+# (handles lazy + animated sites,
+#  stops once scrolling adds nothing)
+# -----------------------------
+async def auto_scroll(page, network):
+
+    previous = await page.evaluate(PROBE_JS)
+
+    steps = 0
+    waited_ms = 0
+
+    while steps < MAX_SCROLL_STEPS:
+
+        with tracer.span("page.scroll_step", step=steps + 1) as span:
+            await page.evaluate(
+                "window.scrollTo(0, document.body.scrollHeight)"
+            )
+            steps += 1
+
+            probe, ms = await wait_for_settle(
+                page,
+                network,
+                max_ms=SCROLL_SETTLE_MAX_MS
+            )
+            waited_ms += ms
+            span["text_length"] = probe["textLength"]
+
+        if (
+            probe["height"] == previous["height"]
+            and probe["textLength"] == previous["textLength"]
+        ):
             break
 
-        previous_height = current_height
+        previous = probe
 
-        await page.evaluate(
-            "window.scrollTo(0, document.body.scrollHeight)"
+    return steps, waited_ms
+
+
+# -----------------------------
+# RENDER PAGE
+# goto -> settle -> scroll -> html
+# -----------------------------
+async def render(page, url):
+
+    network = NetworkTracker(page)
+
+    await page.add_init_script(QUIESCENCE_JS)
+
+    # DNS + connect + first document
+    with tracer.span("page.goto", url=url):
+        response = await page.goto(
+            url,
+            wait_until="domcontentloaded",
+            timeout=60000
         )
 
-        await page.wait_for_timeout(2000)
+    # WAIT for hydration / animations
+    with tracer.span("page.hydration_wait", url=url):
+        _, hydration_ms = await wait_for_settle(page, network)
+
+    # scroll fully
+    with tracer.span("page.auto_scroll", url=url) as span:
+        steps, scroll_ms = await auto_scroll(page, network)
+        span["steps"] = steps
+
+    with tracer.span("page.content", url=url) as span:
+        html = await page.content()
+        span["bytes"] = len(html)
+
+    waited_ms = hydration_ms + scroll_ms
+    fixed_ms = (
+        FIXED_HYDRATION_MS +
+        steps * FIXED_SCROLL_STEP_MS +
+        FIXED_POST_SCROLL_MS
+    )
+
+    print(
+        f"   ⏱️ settled: {url} | waited={waited_ms / 1000:.1f}s "
+        f"vs fixed={fixed_ms / 1000:.1f}s "
+        f"(saved {(fixed_ms - waited_ms) / 1000:.1f}s, scrolls={steps})"
+    )
+
+    return html, response
+
+
+# -----------------------------
+# URL NORMALIZATION
+# http/https, trailing slashes, queries and
+# fragments all collapse to one crawl key
+# -----------------------------
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def clean_url(url):
+
+    parsed = urlparse(url)
+
+    host = (parsed.hostname or "").lower()
+
+    if parsed.port and str(parsed.port) != DEFAULT_PORTS.get(parsed.scheme):
+        host = f"{host}:{parsed.port}"
+
+    return f"{parsed.scheme.lower()}://{host}{parsed.path or '/'}"
+
+
+def is_valid_url(url):
+    try:
+        clean_url(url)
+    except ValueError:
+        return False
+    return True
+
+
+def url_key(url):
+
+    parsed = urlparse(clean_url(url))
+
+    path = parsed.path.rstrip("/") or "/"
+
+    return f"{parsed.netloc}{path}"
+
+
+def dedupe_urls(urls, seen=None):
+
+    seen = set() if seen is None else seen
+    unique = []
+
+    for url in urls:
+        key = url_key(url)
+
+        if key not in seen:
+            seen.add(key)
+            unique.append(clean_url(url))
+
+    return unique
 
 
 # -----------------------------
 # EXTRACT INTERNAL LINKS
+# (anchors come from parse_page,
+#  best-ranked links first)
 # -----------------------------
 def get_internal_links(base_url, html):
-    soup = BeautifulSoup(html, "html.parser")
+    _, anchors = parse_page(html)
 
-    base_domain = urlparse(base_url).netloc
-    links = set()
+    frontier = Frontier(base_url)
+    frontier.add_links(anchors, base_url, depth=1)
 
-    for a in soup.find_all("a", href=True):
+    return [url for url, _ in frontier.pop_batch(MAX_PAGES)]
 
-        href = a["href"]
-        full_url = urljoin(base_url, href)
-        parsed = urlparse(full_url)
 
-        # stay inside domain
-        if parsed.netloc == base_domain:
+def filter_internal_links(base_url, anchors, page_url=None):
 
-            # remove fragments
-            cleaned = full_url.split("#")[0]
+    base_domain = urlparse(clean_url(base_url)).netloc
+    links = []
+
+    for href, anchor in anchors:
+
+        # relative links resolve against the page they were found on;
+        # a malformed href (bad port, broken IPv6 host) is skipped
+        try:
+            full_url = urljoin(page_url or base_url, href)
+            parsed = urlparse(full_url)
+
+            if parsed.scheme not in ("http", "https"):
+                continue
+
+            cleaned = clean_url(full_url)
+        except ValueError:
+            continue
+
+        # stay inside domain
+        if urlparse(cleaned).netloc == base_domain:
 
             # skip files/images
-            if not any(cleaned.endswith(ext) for ext in [
+            if not any(cleaned.lower().endswith(ext) for ext in [
                 ".pdf", ".jpg", ".png", ".zip"
             ]):
-                links.add(cleaned)
+                links.append((cleaned, anchor))
+
+    return links
+
+
+# -----------------------------
+# LINK FRONTIER
+# (priority queue over anchor text + path)
+# -----------------------------
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+
+def score_link(url, anchor, depth):
+
+    path = urlparse(url).path.lower()
+    tokens = set(TOKEN_PATTERN.findall(path))
+    tokens |= set(TOKEN_PATTERN.findall(anchor.lower()))
+
+    score = sum(LINK_PRIORITIES.get(t, 0) for t in tokens)
+
+    return score - DEPTH_PENALTY * (depth - 1)
+
+
+def is_signal_page(url):
+    # by url alone: the anchor is gone once the page is fetched
+    return score_link(url, "", 1) >= SIGNAL_PAGE_SCORE
+
+
+class Frontier:
+
+    def __init__(self, base_url, max_depth=MAX_DEPTH, robots=None):
+        self.base_url = base_url
+        self.max_depth = max_depth
+        self.robots = robots
+        self.heap = []
+        self.order = itertools.count()
+
+        # the homepage itself is never a "link" to crawl again
+        self.seen = {url_key(base_url)}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, url, depth, score):
+
+        key = url_key(url)
+
+        if key in self.seen or depth > self.max_depth:
+            return
+
+        self.seen.add(key)
+
+        if self.robots and not self.robots.can_fetch(USER_AGENT, url):
+            return
+
+        # ties keep document order
+        heapq.heappush(
+            self.heap,
+            (-score, next(self.order), clean_url(url), depth)
+        )
+
+    def add_links(self, anchors, page_url, depth):
+
+        for url, anchor in filter_internal_links(
+            self.base_url,
+            anchors,
+            page_url
+        ):
+            score = score_link(url, anchor, depth)
 
-    return list(links)[:MAX_PAGES]
+            if score >= MIN_LINK_SCORE:
+                self.push(url, depth, score)
+
+    def pop_batch(self, n):
+
+        batch = []
+
+        while self.heap and len(batch) < n:
+            _, _, url, depth = heapq.heappop(self.heap)
+            batch.append((url, depth))
+
+        return batch
 
 
 # -----------------------------
@@ -115,186 +626,2022 @@ def has_signal(text):
 
 
 # -----------------------------
-# SCRAPE SINGLE PAGE
+# REQUEST INTERCEPTION
+# (installed once per browser context,
+#  counters kept per page)
 # -----------------------------
-async def scrape_page(context, url):
-    page = await context.new_page()
+def domain_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
 
-    try:
-        await page.goto(
-            url,
-            wait_until="networkidle",
-            timeout=60000
-        )
 
-        # WAIT for hydration / animations
-        await page.wait_for_timeout(5000)
+class ResourceBlocker:
 
-        # scroll fully
-        await auto_scroll(page)
+    def __init__(
+        self,
+        block_types=BLOCK_RESOURCE_TYPES,
+        allow_types=ALLOW_RESOURCE_TYPES,
+        block_domains=BLOCK_DOMAINS,
+        allow_domains=ALLOW_DOMAINS
+    ):
+        self.block_types = set(block_types)
+        self.allow_types = set(allow_types)
+        self.block_domains = list(block_domains)
+        self.allow_domains = list(allow_domains)
 
-        # extra wait after scroll
-        await page.wait_for_timeout(3000)
+        self.page_stats = {}
+        self.total = new_block_stats()
 
-        html = await page.content()
+    def should_block(self, url, resource_type):
 
-        text = clean_html(html)
+        host = (urlparse(url).hostname or "").lower()
 
-        print(f"   ✅ scraped: {url} | chars={len(text)}")
+        if domain_matches(host, self.allow_domains):
+            return False
 
-        return text
+        # trackers are blocked even when their type is allowed (scripts)
+        if domain_matches(host, self.block_domains):
+            return True
 
-    except Exception as e:
-        print(f"   ❌ failed page: {url} -> {e}")
-        return ""
+        if resource_type in self.allow_types:
+            return False
 
-    finally:
-        await page.close()
+        return resource_type in self.block_types
 
+    async def install(self, context):
+        # NOTE: routing disables the http cache for this context
+        await context.route("**/*", self.handle)
 
-# -----------------------------
-# MULTI PAGE PORTFOLIO
-# -----------------------------
-async def scrape_portfolio(context, record):
+    async def handle(self, route):
 
-    id_, base_url = record["id"], record["portfolio_url"]
+        request = route.request
 
-    try:
-        print(f"\n🔎 Crawling portfolio: {base_url}")
+        if not self.should_block(request.url, request.resource_type):
+            await route.continue_()
+            return
 
-        page = await context.new_page()
+        self._record(request)
 
-        await page.goto(
-            base_url,
-            wait_until="networkidle",
-            timeout=60000
+        await route.abort("blockedbyclient")
+
+    def _record(self, request):
+
+        est = EST_BLOCKED_BYTES.get(
+            request.resource_type,
+            DEFAULT_EST_BLOCKED_BYTES
         )
 
-        await page.wait_for_timeout(5000)
-        await auto_scroll(page)
-        await page.wait_for_timeout(3000)
+        try:
+            page = request.frame.page
+        except Exception:
+            # service worker requests have no frame
+            page = None
 
-        homepage_html = await page.content()
+        targets = [self.total]
 
-        internal_links = get_internal_links(base_url, homepage_html)
+        if page is not None:
+            targets.append(
+                self.page_stats.setdefault(page, new_block_stats())
+            )
 
-        await page.close()
+        for stats in targets:
+            stats["blocked"] += 1
+            stats["bytes_saved"] += est
+            by_type = stats["by_type"]
+            by_type[request.resource_type] = (
+                by_type.get(request.resource_type, 0) + 1
+            )
 
-        # Avoid duplicates
-        pages_to_scrape = list(set([base_url] + internal_links))
+    def pop_stats(self, page):
+        return self.page_stats.pop(page, new_block_stats())
 
-        print(f"   👉 Found {len(pages_to_scrape)} pages")
 
-        tasks = [
-            scrape_page(context, url)
-            for url in pages_to_scrape
-        ]
+def new_block_stats():
+    return {"blocked": 0, "bytes_saved": 0, "by_type": {}}
 
-        results = await asyncio.gather(*tasks)
 
-        combined_text = "\n\n".join(results)[:TEXT_LIMIT]
+def format_block_stats(stats):
 
-        print("   📊 TOTAL TEXT:", len(combined_text))
+    if not stats["blocked"]:
+        return "blocked=0"
 
-        # SMART VALIDATION (not dumb length)
-        if not has_signal(combined_text):
-            print("   ⚠️ Low signal portfolio")
+    types = ", ".join(
+        f"{t}={n}" for t, n in sorted(stats["by_type"].items())
+    )
 
-        return id_, combined_text, "completed"
+    return (
+        f"blocked={stats['blocked']} ({types}) "
+        f"~{stats['bytes_saved'] // 1024} KB saved"
+    )
 
-    except Exception as e:
 
-        print(f"❌ Portfolio failed: {base_url} -> {e}")
+# -----------------------------
+# JS SHELL DETECTION
+# (empty SPA mount point, or almost
+#  no text for a lot of html)
+# -----------------------------
+JS_SHELL_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</div>',
+    re.IGNORECASE
+)
+
+
+def looks_like_js_shell(html, text, homepage=False):
 
-        return id_, None, "failed"
+    # short subpages (about, contact) are normal: the
+    # length floor only applies to the homepage
+    if homepage and len(text) < MIN_STATIC_TEXT:
+        return True
+
+    if len(text) / max(len(html), 1) < MIN_TEXT_DENSITY:
+        return True
+
+    if JS_SHELL_PATTERN.search(html):
+        return True
+
+    return not has_signal(text)
 
 
 # -----------------------------
-# FETCH
+# PAGE SCHEDULER
 # -----------------------------
-async def fetch_pending(conn):
+def is_error_status(status):
+    return status is None or status == 429 or status >= 500
 
-    rows = await conn.fetch(f"""
-        SELECT id, portfolio_url
-        FROM portfolios
-        WHERE status='pending'
-        LIMIT {BATCH_SIZE}
-        FOR UPDATE SKIP LOCKED;
-    """)
 
-    if rows:
-        ids = [r["id"] for r in rows]
+class PageScheduler:
 
-        await conn.execute("""
-            UPDATE portfolios
-            SET status='processing'
-            WHERE id = ANY($1)
-        """, ids)
+    def __init__(
+        self,
+        max_open_pages=MAX_OPEN_PAGES,
+        per_host=PER_HOST_CONCURRENCY,
+        min_interval=HOST_MIN_INTERVAL
+    ):
+        self.pages = asyncio.Semaphore(max_open_pages)
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self.hosts = {}
 
-    return rows
+    def _host(self, url):
+
+        host = urlparse(url).netloc.lower()
+
+        if host not in self.hosts:
+            self.hosts[host] = {
+                "semaphore": asyncio.Semaphore(self.per_host),
+                "lock": asyncio.Lock(),
+                "interval": self.min_interval,
+                # robots.txt crawl-delay raises this for the host
+                "floor": self.min_interval,
+                "next_at": 0.0,
+            }
+
+        return self.hosts[host]
+
+    async def _wait_turn(self, state):
+
+        async with state["lock"]:
+            now = time.monotonic()
+            start_at = max(now, state["next_at"])
+            state["next_at"] = start_at + state["interval"]
+
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    @asynccontextmanager
+    async def host_slot(self, url):
+
+        state = self._host(url)
+
+        async with state["semaphore"]:
+            await self._wait_turn(state)
+            yield
+
+    @asynccontextmanager
+    async def page_slot(self, url):
+
+        # host first, then tab: one global order, no deadlocks
+        async with self.host_slot(url):
+            async with self.pages:
+                yield
+
+    def set_crawl_delay(self, url, seconds):
+
+        state = self._host(url)
+        state["floor"] = max(self.min_interval, min(seconds, MAX_CRAWL_DELAY))
+        state["interval"] = max(state["interval"], state["floor"])
+
+    def record(self, url, elapsed, ok):
+
+        state = self._host(url)
+        previous = state["interval"]
+
+        if not ok or elapsed > SLOW_RESPONSE_SECONDS:
+            state["interval"] = min(
+                max(previous, state["floor"]) * BACKOFF_FACTOR,
+                max(HOST_MAX_INTERVAL, state["floor"])
+            )
+            print(
+                f"   🐢 backing off {urlparse(url).netloc}: "
+                f"{previous:.2f}s -> {state['interval']:.2f}s"
+            )
+        else:
+            state["interval"] = max(
+                previous * RECOVERY_FACTOR,
+                state["floor"]
+            )
 
 
 # -----------------------------
-# UPDATE
+# CRAWL SESSION
+# (per-process shared state: http pool,
+#  resource blocker, tier counters)
 # -----------------------------
-async def update_results(conn, results):
+def new_http_client():
+    return httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS
+        )
+    )
+
+
+class CrawlSession:
+
+    def __init__(
+        self,
+        http=None,
+        blocker=None,
+        scheduler=None,
+        http_first=True
+    ):
+        self.http = http
+        self.blocker = blocker
+        self.scheduler = scheduler or PageScheduler()
+        self.http_first = http_first
+        self.tiers = {"cache": 0, "http": 0, "browser": 0, "failed": 0}
+
+    def record_tier(self, tier):
+        self.tiers[tier] += 1
+
+    def fast_path_rate(self):
+        served = self.tiers["http"] + self.tiers["browser"]
+        return self.tiers["http"] / served if served else 0.0
+
+    def format_tiers(self):
+        return (
+            f"cache={self.tiers['cache']} http={self.tiers['http']} "
+            f"browser={self.tiers['browser']} failed={self.tiers['failed']} "
+            f"(fast path {self.fast_path_rate():.0%})"
+        )
 
-    for id_, text, status in results:
 
-        await conn.execute("""
-            UPDATE portfolios
-            SET cleaned_data=$1,
-                status=$2,
-                last_scraped=$3
-            WHERE id=$4
-        """, text, status, datetime.utcnow(), id_)
+# -----------------------------
+# PAGE RESULT
+# -----------------------------
+def content_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def page_result(
+    url,
+    html,
+    text,
+    tier,
+    status=None,
+    etag=None,
+    last_modified=None,
+    links=None
+):
+    return {
+        "url": url,
+        "html": html,
+        "text": text,
+        "links": links or [],
+        "tier": tier,
+        "status": status,
+        "etag": etag,
+        "last_modified": last_modified,
+        "hash": content_hash(text) if tier != "failed" else None,
+        "html_hash": None,  # set when the snapshot is stored
+    }
 
 
 # -----------------------------
-# WORKER
+# TIER 1: PLAIN HTTP
+# (conditional when we hold validators)
 # -----------------------------
-async def worker():
+async def fetch_static(http, url, cached=None):
 
-    conn = await asyncpg.connect(**DB_CONFIG)
+    headers = {}
 
-    async with async_playwright() as p:
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
 
-        browser = await p.chromium.launch(
-            headless=True,
-            args=["--disable-blink-features=AutomationControlled"]
-        )
+    try:
+        with tracer.span("http.get", url=url, conditional=bool(headers)) as span:
+            response = await http.get(url, headers=headers)
+            span["status"] = response.status_code
+    except httpx.HTTPError as e:
+        print(f"   ↪️ http failed: {url} -> {e!r}")
+        return None, None, {}
+
+    validators = {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+    }
+
+    content_type = response.headers.get("content-type", "")
+
+    if response.status_code != 200 or "html" not in content_type:
+        return response.status_code, None, validators
+
+    return response.status_code, response.text, validators
+
+
+# -----------------------------
+# ROBOTS.TXT + SITEMAP
+# -----------------------------
+SITEMAP_LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+
+async def fetch_text(session, url):
+
+    # small discovery files still go through the host scheduler
+    async with session.scheduler.host_slot(url):
+        started = time.monotonic()
+        try:
+            response = await session.http.get(url)
+        except httpx.HTTPError:
+            response = None
+
+    # a missing robots.txt / sitemap is normal, not a host error
+    session.scheduler.record(
+        url,
+        time.monotonic() - started,
+        response is not None and response.status_code < 500
+    )
+
+    if response is None or response.status_code != 200:
+        return None
+
+    body = response.content
+
+    if body[:2] == b"\x1f\x8b":  # sitemap.xml.gz
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError):
+            return None
+
+    return body.decode(response.encoding or "utf-8", errors="replace")
+
+
+async def read_sitemaps(session, sitemap_urls):
+
+    queue = list(sitemap_urls)
+    urls = []
+    read = 0
+
+    while queue and read < MAX_SITEMAPS and len(urls) < MAX_SITEMAP_URLS:
+
+        xml = await fetch_text(session, queue.pop(0))
+        read += 1
+
+        if not xml:
+            continue
 
-        context = await browser.new_context(
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            viewport={"width": 1400, "height": 900}
+        locs = [
+            loc for loc in (htmllib.unescape(loc) for loc in SITEMAP_LOC.findall(xml))
+            if is_valid_url(loc)
+        ]
+
+        if "<sitemapindex" in xml:
+            queue.extend(locs)
+        else:
+            urls.extend(locs)
+
+    return urls[:MAX_SITEMAP_URLS]
+
+
+async def discover_site(session, base_url):
+
+    site = {
+        "robots": None,
+        "crawl_delay": None,
+        "sitemap": [],
+        "homepage_only": False,
+    }
+
+    if not session.http:
+        return site
+
+    root = urljoin(clean_url(base_url), "/")
+
+    with tracer.span("site.discover", url=root) as span:
+
+        robots_txt = await fetch_text(session, urljoin(root, "/robots.txt"))
+        sitemaps = []
+
+        if robots_txt:
+            robots = RobotFileParser()
+            robots.parse(robots_txt.splitlines())
+
+            site["robots"] = robots
+            site["crawl_delay"] = robots.crawl_delay(USER_AGENT)
+            sitemaps = robots.site_maps() or []
+
+            if site["crawl_delay"]:
+                delay = min(float(site["crawl_delay"]), MAX_CRAWL_DELAY)
+                session.scheduler.set_crawl_delay(root, delay)
+
+                # every page of the portfolio waits out the delay on this host
+                site["homepage_only"] = (
+                    delay * MAX_PAGES > CRAWL_DELAY_BUDGET_SECONDS
+                )
+
+        if not site["homepage_only"]:
+            site["sitemap"] = await read_sitemaps(
+                session,
+                sitemaps or [urljoin(root, "/sitemap.xml")]
+            )
+
+        span["sitemap_urls"] = len(site["sitemap"])
+        span["crawl_delay"] = site["crawl_delay"]
+        span["homepage_only"] = site["homepage_only"]
+
+    if site["crawl_delay"]:
+        print(f"   🤖 robots.txt crawl-delay: {site['crawl_delay']}s")
+
+    if site["homepage_only"]:
+        print(
+            f"   🐌 crawl-delay over the {CRAWL_DELAY_BUDGET_SECONDS}s "
+            f"budget: homepage only"
         )
 
-        while True:
+    if site["sitemap"]:
+        print(f"   🗺️ sitemap: {len(site['sitemap'])} urls")
 
-            records = await fetch_pending(conn)
+    return site
 
-            if not records:
-                print("\n✅ No pending portfolios.")
-                break
 
-            tasks = [
-                scrape_portfolio(context, dict(r))
-                for r in records
-            ]
+# -----------------------------
+# SCRAPE SINGLE PAGE
+# (TIER 2: full browser render)
+# -----------------------------
+async def scrape_page(context, url, blocker=None):
+
+    try:
+        page = await context.new_page()
+    except Exception as e:
+        # a dead context fails this page, not the whole portfolio
+        print(f"   ❌ failed page: {url} -> {e}")
+        return page_result(url, "", "", "failed")
 
-            results = await asyncio.gather(*tasks)
+    started = time.monotonic()
 
-            await update_results(conn, results)
+    try:
+        html, response = await render(page, url)
 
-        await browser.close()
-        await conn.close()
+        with tracer.span("clean_html", url=url, tier="browser"):
+            text, links = parse_page(html)
 
+        elapsed = time.monotonic() - started
+        blocked = (
+            format_block_stats(blocker.pop_stats(page))
+            if blocker else "blocking off"
+        )
+
+        print(
+            f"   ✅ scraped: {url} | chars={len(text)} | "
+            f"{elapsed:.1f}s | {blocked}"
+        )
+
+        if response is None:
+            return page_result(url, html, text, "browser", links=links)
+
+        return page_result(
+            url,
+            html,
+            text,
+            "browser",
+            response.status,
+            response.headers.get("etag"),
+            response.headers.get("last-modified"),
+            links
+        )
+
+    except Exception as e:
+        print(f"   ❌ failed page: {url} -> {e}")
+        return page_result(url, "", "", "failed")
+
+    finally:
+        if blocker:
+            blocker.pop_stats(page)
+        await page.close()
+
+
+# -----------------------------
+# TWO-TIER FETCH
+# 304 -> cached text, then http first,
+# browser only for JS shells
+# -----------------------------
+async def fetch_page(context, url, session, cached=None, homepage=False):
+
+    scheduler = session.scheduler
+
+    # http result of a page judged a JS shell, kept in case the render fails
+    static = None
+
+    validate = cached and (cached["etag"] or cached["last_modified"])
+
+    if session.http and (session.http_first or validate):
+
+        queued_ns = time.time_ns()
+
+        async with scheduler.host_slot(url):
+            tracer.record("scheduler.wait", queued_ns, url=url, slot="host")
+            started = time.monotonic()
+            status, html, validators = await fetch_static(
+                session.http,
+                url,
+                cached if validate else None
+            )
+
+        scheduler.record(
+            url,
+            time.monotonic() - started,
+            not is_error_status(status)
+        )
+
+        if status == 304 and validate:
+            session.record_tier("cache")
+
+            print(f"   ♻️ not modified: {url} | tier=cache")
+
+            return page_result(
+                url,
+                None,
+                cached["cleaned_text"],
+                "cache",
+                status,
+                cached["etag"],
+                cached["last_modified"]
+            )
+
+        if html and session.http_first:
+            with tracer.span("clean_html", url=url, tier="http"):
+                text, links = parse_page(html)
+
+            static = page_result(
+                url,
+                html,
+                text,
+                "http",
+                status,
+                validators["etag"],
+                validators["last_modified"],
+                links
+            )
+
+            if not looks_like_js_shell(html, text, homepage):
+                elapsed = time.monotonic() - started
+                session.record_tier("http")
+
+                print(
+                    f"   ⚡ fetched: {url} | chars={len(text)} | "
+                    f"{elapsed:.2f}s | tier=http"
+                )
+
+                return static
+
+    queued_ns = time.time_ns()
+
+    async with scheduler.page_slot(url):
+        tracer.record("scheduler.wait", queued_ns, url=url, slot="page")
+        started = time.monotonic()
+        result = await scrape_page(context, url, session.blocker)
+
+    scheduler.record(
+        url,
+        time.monotonic() - started,
+        not is_error_status(result["status"])
+    )
+
+    if result["tier"] == "failed" and static and static["text"] and not homepage:
+        # the render failed: what http returned beats nothing, but it is
+        # stored without validators so a 304 can never pin the shell text
+        # and the next crawl renders it again; a shell homepage stays failed
+        print(f"   ↩️ render failed, keeping http text: {url} | chars={len(static['text'])}")
+        result = dict(static, etag=None, last_modified=None)
+
+    session.record_tier(result["tier"])
+
+    return result
+
+
+# -----------------------------
+# CROSS-PAGE BOILERPLATE FILTER
+# (word shingles seen on earlier pages)
+# -----------------------------
+class BoilerplateFilter:
+
+    def __init__(self, shingle_words=SHINGLE_WORDS):
+        self.k = shingle_words
+        self.seen = set()
+        self.heads = []
+        self.tails = []
+        self.removed_bytes = 0
+
+    @staticmethod
+    def shared_edge(words, edges):
+
+        # longest run this page shares with an earlier page's edge
+        longest = 0
+
+        for edge in edges:
+            n = 0
+            for a, b in zip(words, edge):
+                if a != b:
+                    break
+                n += 1
+            longest = max(longest, n)
+
+        return longest if longest >= EDGE_MIN_WORDS else 0
+
+    def clean(self, text):
+
+        words = text.split()
+        k = self.k
+
+        if not words:
+            return text
+
+        repeated = [False] * len(words)
+
+        # short nav/footer runs repeated at the start or end of the page
+        head = self.shared_edge(words, self.heads)
+        tail = self.shared_edge(words[::-1], self.tails)
+
+        repeated[:head] = [True] * head
+        repeated[len(words) - tail:] = [True] * tail
+
+        self.heads.append(words[:EDGE_MAX_WORDS])
+        self.tails.append(words[::-1][:EDGE_MAX_WORDS])
+
+        shingles = [
+            hash(tuple(words[i:i + k]))
+            for i in range(len(words) - k + 1)
+        ]
+
+        # words covered by any shingle an earlier page already had
+        for i, shingle in enumerate(shingles):
+            if shingle in self.seen:
+                repeated[i:i + k] = [True] * k
+
+        self.seen.update(shingles)
+
+        if not any(repeated):
+            return text
+
+        kept = " ".join(w for w, r in zip(words, repeated) if not r)
+
+        self.removed_bytes += (
+            len(text.encode("utf-8")) - len(kept.encode("utf-8"))
+        )
+
+        return kept
+
+
+# -----------------------------
+# BOUNDED TEXT ACCUMULATOR
+# (boilerplate removed first, then never
+#  holds more than TEXT_LIMIT chars)
+# -----------------------------
+class TextAccumulator:
+
+    SEPARATOR = "\n\n"
+
+    def __init__(self, limit=TEXT_LIMIT):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.signal_chars = 0
+        self.boilerplate = BoilerplateFilter()
+
+    @property
+    def full(self):
+        return self.size >= self.limit
+
+    def add(self, text, signal=False):
+
+        if not text or self.full:
+            return
+
+        text = self.boilerplate.clean(text)
+
+        if not text:
+            return
+
+        if self.parts:
+            self.size += len(self.SEPARATOR)
+
+        piece = text[:max(self.limit - self.size, 0)]
+
+        if piece:
+            self.parts.append(piece)
+            self.size += len(piece)
+
+            if signal:
+                self.signal_chars += len(piece)
+
+    def text(self):
+        return self.SEPARATOR.join(self.parts)[:self.limit]
+
+
+# -----------------------------
+# STREAMING FRONTIER CRAWL
+# results are consumed as they complete, in
+# frontier (launch) order; once the text budget
+# is spent, outstanding fetches are cancelled
+# -----------------------------
+def stop_reason(accumulator):
+
+    if accumulator.full:
+        return f"text limit reached ({accumulator.limit} chars)"
+
+    if accumulator.signal_chars >= ENOUGH_SIGNAL_CHARS:
+        return f"enough signal ({accumulator.signal_chars} chars)"
+
+    return None
+
+
+async def crawl_frontier(context, frontier, home, session, cache):
+
+    results = []
+    accumulator = TextAccumulator()
+
+    inflight = {}      # task -> (seq, depth, url)
+    completed = {}     # seq -> (depth, page), waiting for its turn
+    next_seq = 0
+    next_accept = 0
+    launched = 0
+
+    def launch(url, depth):
+        nonlocal next_seq
+
+        task = asyncio.create_task(
+            fetch_page(context, url, session, cache.get(url_key(url)), depth == 0)
+        )
+
+        inflight[task] = (next_seq, depth, url)
+        next_seq += 1
+
+    if home is None:
+        # planned from the sitemap: the homepage is fetched
+        # alongside its subpages, seq 0 keeps its text first
+        launch(clean_url(frontier.base_url), 0)
+    else:
+        results.append(home)
+        accumulator.add(home["text"])
+
+    stop = stop_reason(accumulator)
+    cancelled = 0
+
+    try:
+
+        while True:
+
+            while (
+                not stop
+                and frontier
+                and len(inflight) < PAGES_IN_FLIGHT
+                and launched < MAX_PAGES
+            ):
+                (url, depth), = frontier.pop_batch(1)
+
+                launch(url, depth)
+                launched += 1
+
+            if stop or not inflight:
+                break
+
+            done, _ = await asyncio.wait(
+                inflight,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                seq, depth, url = inflight.pop(task)
+
+                # one page blowing up fails that page, not the portfolio
+                try:
+                    page = task.result()
+                except Exception as e:
+                    print(f"   ❌ failed page: {url} -> {e!r}")
+                    session.record_tier("failed")
+                    page = page_result(url, "", "", "failed")
+
+                completed[seq] = (depth, page)
+
+            while next_accept in completed and not stop:
+
+                depth, page = completed.pop(next_accept)
+                next_accept += 1
+
+                results.append(page)
+                accumulator.add(page["text"], is_signal_page(page["url"]))
+
+                # deeper links compete with what is still queued
+                frontier.add_links(page["links"], page["url"], depth + 1)
+
+                stop = stop_reason(accumulator)
+
+    finally:
+
+        # never leave fetches running once the context goes back to the pool
+        cancelled = len(inflight)
+
+        for task in inflight:
+            task.cancel()
+
+        # let cancelled renders close their tabs
+        await asyncio.gather(*inflight, return_exceptions=True)
+
+    stats = {
+        "fetched": launched - cancelled,
+        "cancelled": cancelled,
+        "skipped": min(len(frontier), MAX_PAGES - launched),
+        "stop": stop,
+        "boilerplate_bytes": accumulator.boilerplate.removed_bytes,
+    }
+
+    if stop:
+        print(f"   ✋ {stop}: stopped early")
+
+    return results, accumulator, stats
+
+
+# -----------------------------
+# MULTI PAGE PORTFOLIO
+# -----------------------------
+async def scrape_portfolio(context, record, session=None):
+
+    id_, base_url = record["id"], record["portfolio_url"]
+
+    # url_key -> crawl_pages row from the previous crawl
+    cache = record.get("cache") or {}
+
+    session = session or CrawlSession()
+    tiers_before = dict(session.tiers)
+
+    try:
+        print(f"\n🔎 Crawling portfolio: {base_url}")
+
+        site = await discover_site(session, base_url)
+
+        frontier = Frontier(base_url, robots=site["robots"])
+        sitemap_links = [(url, "") for url in site["sitemap"]]
+
+        if sitemap_links and not cache:
+            # the crawl is planned without a render: the homepage
+            # is fetched in parallel with the best sitemap pages
+            frontier.add_links(sitemap_links, base_url, depth=1)
+            home = None
+        else:
+            home = await fetch_page(
+                context,
+                clean_url(base_url),
+                session,
+                cache.get(url_key(base_url)),
+                homepage=True
+            )
+
+            if home["tier"] == "failed":
+                raise RuntimeError("homepage could not be loaded")
+
+            if site["homepage_only"]:
+                # a long crawl-delay: nothing past the homepage is queued
+                pass
+
+            elif home["tier"] == "cache":
+                # homepage unchanged: the previous crawl plan still holds
+                # (pages that failed last time included), plus anything
+                # new in the sitemap
+                for row in cache.values():
+                    frontier.push(row["url"], 1, -row["rank"])
+                frontier.add_links(sitemap_links, base_url, depth=1)
+            else:
+                # homepage is already rendered: reuse it, only fetch the rest
+                frontier.add_links(home["links"], home["url"], depth=1)
+                frontier.add_links(sitemap_links, base_url, depth=1)
+
+        print(f"   👉 Found {len(frontier) + 1} pages")
+
+        results, accumulator, stats = await crawl_frontier(
+            context,
+            frontier,
+            home,
+            session,
+            cache
+        )
+
+        if results[0]["tier"] == "failed":
+            raise RuntimeError("homepage could not be loaded")
+
+        combined_text = accumulator.text()
+
+        print(
+            f"   ⏭️ renders avoided: {stats['cancelled'] + stats['skipped']} "
+            f"(cancelled={stats['cancelled']}, never started={stats['skipped']})"
+        )
+        print(
+            f"   🧹 boilerplate removed: {stats['boilerplate_bytes']} bytes"
+        )
+
+        tiers = {
+            tier: count - tiers_before[tier]
+            for tier, count in session.tiers.items()
+        }
+
+        print("   📊 TOTAL TEXT:", len(combined_text))
+        print(
+            f"   🧭 tiers: cache={tiers['cache']} http={tiers['http']} "
+            f"browser={tiers['browser']} failed={tiers['failed']}"
+        )
+
+        # SMART VALIDATION (not dumb length)
+        if not has_signal(combined_text):
+            print("   ⚠️ Low signal portfolio")
+
+        return {
+            "id": id_,
+            "text": combined_text,
+            "status": "completed",
+            "pages": results,
+            "stats": stats,
+        }
+
+    except Exception as e:
+
+        print(f"❌ Portfolio failed: {base_url} -> {e}")
+
+        return {"id": id_, "text": None, "status": "failed", "pages": []}
+
+
+# -----------------------------
+# FETCH
+# (claim + lease in ONE statement so parallel
+#  processes never grab the same row)
+# -----------------------------
+async def fetch_pending(conn, worker_id, limit=1):
+
+    rows = await conn.fetch(f"""
+        UPDATE portfolios
+        SET status='processing',
+            claimed_by=$2,
+            claimed_at={NOW_UTC},
+            lease_expires_at={NOW_UTC} + $3 * INTERVAL '1 second',
+            attempts=attempts + 1
+        WHERE id IN (
+            SELECT id
+            FROM portfolios
+            WHERE status='pending'
+            ORDER BY id
+            LIMIT $1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, portfolio_url, attempts;
+    """, limit, worker_id, LEASE_SECONDS)
+
+    return rows
+
+
+# -----------------------------
+# LEASE HEARTBEAT
+# (extends the claim while a portfolio is crawled)
+# -----------------------------
+async def extend_lease(conn, portfolio_id, worker_id):
+
+    result = await conn.execute(f"""
+        UPDATE portfolios
+        SET lease_expires_at={NOW_UTC} + $3 * INTERVAL '1 second'
+        WHERE id=$1
+          AND claimed_by=$2
+          AND status='processing';
+    """, portfolio_id, worker_id, LEASE_SECONDS)
+
+    return result.split()[-1] == "1"
+
+
+async def heartbeat(db, portfolio_id, worker_id):
+
+    while True:
+
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+
+        try:
+            async with db.acquire() as conn:
+                held = await extend_lease(conn, portfolio_id, worker_id)
+        except Exception as e:
+            print(f"   ⚠️ heartbeat failed for {portfolio_id}: {e}")
+            continue
+
+        if not held:
+            print(f"   ⚠️ lease lost for portfolio {portfolio_id}")
+            return
+
+
+@asynccontextmanager
+async def leased(db, portfolio_id, worker_id):
+
+    task = asyncio.create_task(heartbeat(db, portfolio_id, worker_id))
+
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+# -----------------------------
+# REAPER
+# (expired leases -> pending, poison rows -> failed)
+# -----------------------------
+async def reap_expired(conn, max_attempts=MAX_ATTEMPTS):
+
+    # NULL lease = claimed before leases existed
+    rows = await conn.fetch(f"""
+        UPDATE portfolios
+        SET status=CASE
+                WHEN attempts >= $1 THEN 'failed'
+                ELSE 'pending'
+            END,
+            claimed_by=NULL,
+            claimed_at=NULL,
+            lease_expires_at=NULL
+        WHERE status='processing'
+          AND (
+              lease_expires_at IS NULL
+              OR lease_expires_at < {NOW_UTC}
+          )
+        RETURNING id, portfolio_url, status, attempts;
+    """, max_attempts)
+
+    for r in rows:
+        if r["status"] == "failed":
+            print(
+                f"   ☠️ giving up on {r['portfolio_url']} "
+                f"after {r['attempts']} attempts"
+            )
+        else:
+            print(f"   🔁 lease expired, requeued: {r['portfolio_url']}")
+
+    return rows
+
+
+async def reaper(db):
+
+    while True:
+
+        try:
+            async with db.acquire() as conn:
+                await reap_expired(conn)
+        except Exception as e:
+            print(f"   ⚠️ reaper failed: {e}")
+
+        await asyncio.sleep(REAP_SECONDS)
+
+
+# -----------------------------
+# PAGE CACHE
+# (validators + cleaned text of the last crawl)
+# -----------------------------
+async def load_page_cache(conn, portfolio_id):
+
+    rows = await conn.fetch("""
+        SELECT url, rank, etag, last_modified, content_hash, cleaned_text
+        FROM crawl_pages
+        WHERE portfolio_id=$1;
+    """, portfolio_id)
+
+    return {url_key(r["url"]): dict(r) for r in rows}
+
+
+async def save_page_cache(conn, portfolio_id, pages, now):
+
+    for rank, page in enumerate(pages):
+
+        if page["tier"] == "failed":
+
+            # stays in the crawl plan so a 304 homepage retries it;
+            # a page that failed this time keeps its last good copy
+            await conn.execute("""
+                INSERT INTO crawl_pages (
+                    portfolio_id, url, rank, tier, checked_at
+                )
+                VALUES ($1, $2, $3, 'failed', $4)
+                ON CONFLICT (portfolio_id, url) DO UPDATE
+                SET rank=EXCLUDED.rank,
+                    checked_at=EXCLUDED.checked_at;
+            """, portfolio_id, page["url"], rank, now)
+
+            continue
+
+        await conn.execute("""
+            INSERT INTO crawl_pages (
+                portfolio_id, url, rank, etag, last_modified,
+                content_hash, cleaned_text, tier, html_hash,
+                fetched_at, checked_at
+            )
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $10)
+            ON CONFLICT (portfolio_id, url) DO UPDATE
+            SET rank=EXCLUDED.rank,
+                etag=EXCLUDED.etag,
+                last_modified=EXCLUDED.last_modified,
+                content_hash=EXCLUDED.content_hash,
+                cleaned_text=EXCLUDED.cleaned_text,
+                tier=EXCLUDED.tier,
+                -- a 304 has no body: keep the snapshot we have
+                html_hash=COALESCE(EXCLUDED.html_hash, crawl_pages.html_hash),
+                fetched_at=CASE
+                    WHEN EXCLUDED.tier = 'cache' THEN crawl_pages.fetched_at
+                    ELSE EXCLUDED.fetched_at
+                END,
+                checked_at=EXCLUDED.checked_at;
+        """,
+            portfolio_id,
+            page["url"],
+            rank,
+            page["etag"],
+            page["last_modified"],
+            page["hash"],
+            page["text"],
+            page["tier"],
+            page["html_hash"],
+            now
+        )
+
+    # pages no longer linked from the portfolio
+    await conn.execute("""
+        DELETE FROM crawl_pages
+        WHERE portfolio_id=$1
+          AND NOT (url = ANY($2));
+    """, portfolio_id, [p["url"] for p in pages])
+
+
+# -----------------------------
+# REQUEUE STALE PORTFOLIOS
+# (re-crawl; unchanged pages are served from cache)
+# -----------------------------
+async def requeue_stale(conn, older_than_hours):
+
+    result = await conn.execute("""
+        UPDATE portfolios
+        SET status='pending'
+        WHERE status='completed'
+          AND last_scraped < (NOW() AT TIME ZONE 'UTC') - $1 * INTERVAL '1 hour';
+    """, older_than_hours)
+
+    return int(result.split()[-1])
+
+
+# -----------------------------
+# UPDATE
+# -----------------------------
+async def update_results(conn, results, worker_id):
+
+    for result in results:
+
+        now = datetime.utcnow()
+
+        if result["status"] == "failed":
+
+            # a failed re-crawl keeps the previous cleaned_data
+            await conn.execute("""
+                UPDATE portfolios
+                SET status=$1,
+                    last_scraped=$2,
+                    claimed_by=NULL,
+                    claimed_at=NULL,
+                    lease_expires_at=NULL
+                WHERE id=$3
+                  AND claimed_by=$4
+            """, result["status"], now, result["id"], worker_id)
+
+            continue
+
+        async with conn.transaction():
+
+            # changed content invalidates the LLM evaluation (agent3);
+            # unchanged content leaves every downstream column alone.
+            # only the lease holder may write: a reaped + reclaimed row
+            # belongs to someone else now
+            row = await conn.fetchrow("""
+                WITH old AS (
+                    SELECT content_hash
+                    FROM portfolios
+                    WHERE id=$4
+                    FOR UPDATE
+                )
+                UPDATE portfolios p
+                SET cleaned_data=$1,
+                    status=$2,
+                    last_scraped=$3,
+                    content_hash=$5,
+                    content_updated_at=CASE
+                        WHEN p.content_hash IS DISTINCT FROM $5 THEN $3
+                        ELSE p.content_updated_at
+                    END,
+                    ai_backend_score=CASE
+                        WHEN p.content_hash IS DISTINCT FROM $5 THEN NULL
+                        ELSE p.ai_backend_score
+                    END,
+                    ai_ai_score=CASE
+                        WHEN p.content_hash IS DISTINCT FROM $5 THEN NULL
+                        ELSE p.ai_ai_score
+                    END,
+                    final_backend_score=CASE
+                        WHEN p.content_hash IS DISTINCT FROM $5 THEN NULL
+                        ELSE p.final_backend_score
+                    END,
+                    final_ai_score=CASE
+                        WHEN p.content_hash IS DISTINCT FROM $5 THEN NULL
+                        ELSE p.final_ai_score
+                    END,
+                    claimed_by=NULL,
+                    claimed_at=NULL,
+                    lease_expires_at=NULL,
+                    attempts=0
+                FROM old
+                WHERE p.id=$4
+                  AND p.claimed_by=$6
+                RETURNING old.content_hash IS DISTINCT FROM $5 AS changed;
+            """,
+                result["text"],
+                result["status"],
+                now,
+                result["id"],
+                content_hash(result["text"]),
+                worker_id
+            )
+
+            if row is None:
+                print(
+                    f"   ⚠️ portfolio {result['id']}: lease lost, "
+                    "result discarded"
+                )
+                continue
+
+            previous = await conn.fetch("""
+                SELECT DISTINCT html_hash
+                FROM crawl_pages
+                WHERE portfolio_id=$1
+                  AND html_hash IS NOT NULL;
+            """, result["id"])
+
+            await save_snapshots(conn, result["pages"])
+            await save_page_cache(conn, result["id"], result["pages"], now)
+
+            # snapshots this crawl replaced, unless another page still uses them
+            await prune_snapshots(conn, {r["html_hash"] for r in previous})
+
+        if not row["changed"]:
+            print(f"   ♻️ portfolio {result['id']}: content unchanged")
+
+
+# -----------------------------
+# RE-EXTRACT FROM SNAPSHOTS
+# rebuilds cleaned_data with the current parser
+# and filters: no network, no browser
+# -----------------------------
+REEXTRACT_BATCH = 200
+
+
+def reextract_portfolio(pages):
+
+    # pages: [(url, codec, data, cleaned_text)] in crawl (rank) order
+    accumulator = TextAccumulator()
+    texts = []
+
+    for url, codec, data, cleaned_text in pages:
+
+        if stop_reason(accumulator):
+            break
+
+        if data is None:
+            # crawled before snapshots existed
+            text = cleaned_text or ""
+        else:
+            text, _ = parse_page(decompress(codec, data))
+
+        texts.append(text)
+        accumulator.add(text, is_signal_page(url))
+
+    return accumulator.text(), texts
+
+
+async def save_reextracted(conn, portfolio_id, urls, texts, text):
+
+    async with conn.transaction():
+
+        await conn.executemany("""
+            UPDATE crawl_pages
+            SET cleaned_text=$3,
+                content_hash=$4
+            WHERE portfolio_id=$1
+              AND url=$2;
+        """, [
+            (portfolio_id, url, page_text, content_hash(page_text))
+            for url, page_text in zip(urls, texts)
+        ])
+
+        # same invalidation as a re-crawl with changed content
+        changed = await conn.fetchval(f"""
+            UPDATE portfolios
+            SET cleaned_data=$2,
+                content_hash=$3,
+                content_updated_at={NOW_UTC},
+                ai_backend_score=NULL,
+                ai_ai_score=NULL,
+                final_backend_score=NULL,
+                final_ai_score=NULL
+            WHERE id=$1
+              AND status='completed'
+              AND content_hash IS DISTINCT FROM $3
+            RETURNING id;
+        """, portfolio_id, text, content_hash(text))
+
+    return changed is not None
+
+
+async def reextract_all(processes):
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+    loop = asyncio.get_running_loop()
+
+    totals = {"portfolios": 0, "changed": 0, "pages": 0, "no_snapshot": 0}
+    started = time.monotonic()
+    last_id = 0
+
+    try:
+        with ProcessPoolExecutor(
+            processes,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+
+            while True:
+
+                ids = [r["id"] for r in await conn.fetch("""
+                    SELECT id
+                    FROM portfolios
+                    WHERE status='completed'
+                      AND id > $1
+                    ORDER BY id
+                    LIMIT $2;
+                """, last_id, REEXTRACT_BATCH)]
+
+                if not ids:
+                    break
+
+                last_id = ids[-1]
+
+                rows = await conn.fetch("""
+                    SELECT cp.portfolio_id, cp.url, cp.cleaned_text,
+                           s.codec, s.data
+                    FROM crawl_pages cp
+                    LEFT JOIN html_snapshots s ON s.hash = cp.html_hash
+                    WHERE cp.portfolio_id = ANY($1)
+                      AND cp.tier IS DISTINCT FROM 'failed'
+                    ORDER BY cp.portfolio_id, cp.rank;
+                """, ids)
+
+                pages = {}
+
+                for r in rows:
+                    pages.setdefault(r["portfolio_id"], []).append(r)
+
+                jobs = {
+                    pid: loop.run_in_executor(
+                        executor,
+                        reextract_portfolio,
+                        [
+                            (r["url"], r["codec"], r["data"], r["cleaned_text"])
+                            for r in group
+                        ]
+                    )
+                    for pid, group in pages.items()
+                }
+
+                for pid, job in jobs.items():
+
+                    text, texts = await job
+                    urls = [r["url"] for r in pages[pid]]
+
+                    if await save_reextracted(conn, pid, urls, texts, text):
+                        totals["changed"] += 1
+
+                    totals["portfolios"] += 1
+                    totals["pages"] += len(texts)
+                    totals["no_snapshot"] += sum(
+                        r["data"] is None for r in pages[pid][:len(texts)]
+                    )
+
+                print(
+                    f"   🔁 {totals['portfolios']} portfolios re-extracted "
+                    f"({totals['changed']} changed)"
+                )
+
+        pruned = await prune_snapshots(conn)
+
+    finally:
+        await conn.close()
+
+    elapsed = time.monotonic() - started
+
+    print(
+        f"\n✅ Re-extracted {totals['portfolios']} portfolios / "
+        f"{totals['pages']} pages in {elapsed:.1f}s "
+        f"(changed={totals['changed']}, "
+        f"pages without snapshot={totals['no_snapshot']}, "
+        f"orphan snapshots pruned={pruned})"
+    )
+
+
+# -----------------------------
+# BROWSER CONTEXT POOL
+# (bounded, recycled after N pages)
+# -----------------------------
+class ContextPool:
+
+    def __init__(self, browser, size, pages_per_context, blocker=None):
+        self.browser = browser
+        self.size = size
+        self.pages_per_context = pages_per_context
+        self.blocker = blocker
+        self.idle = asyncio.Queue()
+        self.pages_opened = {}
+        self.recycled = 0
+
+    async def start(self):
+        for _ in range(self.size):
+            await self.idle.put(await self._new_context())
+
+    async def _new_context(self):
+        context = await self.browser.new_context(
+            user_agent=USER_AGENT,
+            viewport=VIEWPORT
+        )
+
+        self.pages_opened[context] = 0
+        context.on("page", lambda _: self._count_page(context))
+
+        if self.blocker:
+            await self.blocker.install(context)
+
+        return context
+
+    def _count_page(self, context):
+        if context in self.pages_opened:
+            self.pages_opened[context] += 1
+
+    async def acquire(self):
+        return await self.idle.get()
+
+    async def release(self, context):
+
+        if self.pages_opened.get(context, 0) >= self.pages_per_context:
+            self.pages_opened.pop(context, None)
+            await context.close()
+            context = await self._new_context()
+            self.recycled += 1
+
+        await self.idle.put(context)
+
+    async def close(self):
+        while not self.idle.empty():
+            context = self.idle.get_nowait()
+            self.pages_opened.pop(context, None)
+            await context.close()
+
+
+# -----------------------------
+# CRAWL SLOT
+# (one portfolio at a time per context)
+# -----------------------------
+async def back_off(failures, waiter=None):
+
+    delay = min(DB_BACKOFF_MAX_SECONDS, DB_BACKOFF_SECONDS * 2 ** (failures - 1))
+
+    if not waiter:
+        await asyncio.sleep(delay)
+        return
+
+    # shutdown cuts the wait short
+    try:
+        await asyncio.wait_for(waiter.stopping.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def crawl_slot(db, pool, session, worker_id, waiter=None, feed=None):
+
+    crawled = 0
+    failures = 0
+
+    while True:
+
+        if waiter:
+            if waiter.stopping.is_set():
+                return crawled
+
+            # cleared BEFORE the claim: a NOTIFY that lands after an
+            # empty claim still wakes us up
+            waiter.wakeup.clear()
+
+        try:
+            async with db.acquire() as conn:
+                records = await fetch_pending(conn, worker_id)
+
+                if records:
+                    record = dict(records[0])
+                    record["cache"] = await load_page_cache(conn, record["id"])
+        except Exception as e:
+            # a claimed row whose cache failed to load is
+            # requeued by the reaper once its lease expires
+            failures += 1
+            print(f"   ⚠️ claim failed ({failures} in a row): {e}")
+
+            if not waiter and failures >= DB_MAX_FAILURES:
+                raise
+
+            await back_off(failures, waiter)
+            continue
+
+        failures = 0
+
+        if not records and not waiter:
+            return crawled
+
+        if not records:
+            if feed:
+                await feed.flush()
+            await waiter.wait()
+            continue
+
+        with tracer.portfolio(record["id"], record["portfolio_url"]):
+
+            context = await pool.acquire()
+
+            try:
+                async with leased(db, record["id"], worker_id):
+                    result = await scrape_portfolio(context, record, session)
+            finally:
+                await pool.release(context)
+
+            try:
+                with tracer.span("db.write", pages=len(result["pages"])):
+                    async with db.acquire() as conn:
+                        await update_results(conn, [result], worker_id)
+            except Exception as e:
+                # the lease expires and the reaper requeues the portfolio
+                print(f"   ⚠️ saving {record['portfolio_url']} failed: {e}")
+                await back_off(1, waiter)
+                continue
+
+            if feed and result["status"] == "completed":
+                await feed.add(result)
+
+        crawled += 1
+
+
+# -----------------------------
+# PENDING WAITER (daemon mode)
+# LISTEN on a dedicated connection; slots block
+# until NOTIFY, the sweep timeout, or shutdown
+# -----------------------------
+class PendingWaiter:
+
+    def __init__(self, sweep_seconds=SWEEP_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self.wakeup = asyncio.Event()
+        self.stopping = asyncio.Event()
+        self.conn = None
+        self.reconnecting = None
+
+    async def start(self):
+        await self._listen()
+
+    async def _listen(self):
+        conn = await asyncpg.connect(**DB_CONFIG)
+        await conn.add_listener(PENDING_CHANNEL, self._notified)
+        conn.add_termination_listener(self._lost)
+        self.conn = conn
+
+    def _notified(self, conn, pid, channel, payload):
+        self.wakeup.set()
+
+    def _lost(self, conn):
+
+        if conn is not self.conn:
+            return
+
+        self.conn = None
+
+        if not self.stopping.is_set():
+            print("⚠️ LISTEN connection lost, reconnecting")
+            # sweep now: notifications sent while it was down are gone
+            self.wakeup.set()
+            self._reconnect_soon()
+
+    def _reconnect_soon(self):
+        if not self.reconnecting or self.reconnecting.done():
+            self.reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+
+        failures = 0
+
+        while not self.stopping.is_set():
+            try:
+                await self._listen()
+            except Exception as e:
+                failures += 1
+                print(f"⚠️ LISTEN reconnect failed ({failures}): {e}")
+                await back_off(failures, self)
+                continue
+
+            print(f"🔔 Listening on '{PENDING_CHANNEL}' again")
+            self.wakeup.set()
+            return
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    async def wait(self):
+
+        # the sweep doubles as a health check on the LISTEN connection
+        if not self.stopping.is_set() and (self.conn is None or self.conn.is_closed()):
+            self.conn = None
+            self._reconnect_soon()
+
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), self.sweep_seconds)
+        except asyncio.TimeoutError:
+            pass  # periodic sweep
+
+    async def close(self):
+
+        if self.reconnecting:
+            self.reconnecting.cancel()
+            await asyncio.gather(self.reconnecting, return_exceptions=True)
+
+        conn, self.conn = self.conn, None
+
+        if conn and not conn.is_closed():
+            conn.remove_termination_listener(self._lost)
+            await conn.remove_listener(PENDING_CHANNEL, self._notified)
+            await conn.close()
+
+
+class IndexFeed:
+
+    def __init__(self, path, flush_docs=BM25_FLUSH_DOCS):
+        self.path = path
+        self.flush_docs = flush_docs
+        self.pending = []
+        self.indexed = 0
+        self.lock = asyncio.Lock()
+
+    async def add(self, result):
+
+        self.pending.append(
+            (result["id"], content_hash(result["text"]), result["text"])
+        )
+
+        if len(self.pending) >= self.flush_docs:
+            await self.flush()
+
+    async def flush(self):
+
+        async with self.lock:
+
+            batch, self.pending = self.pending, []
+
+            if not batch:
+                return
+
+            # segment writes are file IO + numpy: off the event loop.
+            # a failure only delays indexing: bm25.py --sync catches up
+            try:
+                with tracer.span("bm25.flush", docs=len(batch)):
+                    self.indexed += await asyncio.to_thread(
+                        bm25.add_documents, self.path, batch
+                    )
+            except Exception as e:
+                print(f"   ⚠️ BM25 index update failed: {e}")
+
+
+# -----------------------------
+# WORKER (one per process)
+# -----------------------------
+async def worker(worker_id, options):
+
+    contexts = options["contexts"]
+
+    # lease owner id: unique per process, readable in the table
+    lease_owner = f"{socket.gethostname()}:{os.getpid()}:w{worker_id}"
+
+    # one connection per slot + heartbeats + reaper
+    db = await asyncpg.create_pool(
+        **DB_CONFIG,
+        min_size=1,
+        max_size=contexts + 2
+    )
+
+    blocker = ResourceBlocker() if options["block_resources"] else None
+    # the http client also revalidates cached pages in --browser-only mode
+    http = new_http_client()
+
+    session = CrawlSession(
+        http,
+        blocker,
+        PageScheduler(max_open_pages=options["max_open_pages"]),
+        options["http_first"]
+    )
+
+    async with async_playwright() as p:
+
+        browser = await p.chromium.launch(
+            headless=True,
+            args=["--disable-blink-features=AutomationControlled"]
+        )
+
+        pool = ContextPool(
+            browser,
+            contexts,
+            options["pages_per_context"],
+            blocker
+        )
+        await pool.start()
+
+        waiter = None
+
+        if options["daemon"]:
+            waiter = PendingWaiter(options["sweep_seconds"])
+            await waiter.start()
+
+            # finish the portfolios in hand, then exit
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, waiter.stop)
+
+            print(
+                f"   👂 Worker {worker_id}: listening on "
+                f"'{PENDING_CHANNEL}' (sweep every {waiter.sweep_seconds}s)"
+            )
+
+        feed = IndexFeed(options["bm25_index"]) if options["bm25_index"] else None
+
+        # recover rows left behind by crashed workers first,
+        # then keep reaping while this worker runs
+        reaping = asyncio.create_task(reaper(db))
+
+        try:
+            counts = await asyncio.gather(*[
+                crawl_slot(db, pool, session, lease_owner, waiter, feed)
+                for _ in range(contexts)
+            ])
+        finally:
+            reaping.cancel()
+            await asyncio.gather(reaping, return_exceptions=True)
+
+            if feed:
+                await feed.flush()
+
+            if waiter:
+                await waiter.close()
+
+            await pool.close()
+            await browser.close()
+            await db.close()
+            await http.aclose()
+
+    done = "stopped" if options["daemon"] else "no pending portfolios"
+
+    print(
+        f"\n✅ Worker {worker_id}: {done} "
+        f"(crawled={sum(counts)}, contexts recycled={pool.recycled})"
+    )
+
+    print(f"   🧭 Worker {worker_id}: {session.format_tiers()}")
+
+    if feed:
+        print(f"   📚 Worker {worker_id}: {feed.indexed} portfolio(s) added to the BM25 index")
+
+    if blocker:
+        print(f"   🛡️ Worker {worker_id}: {format_block_stats(blocker.total)}")
+
+
+async def requeue_stale_portfolios(older_than_hours):
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+
+    try:
+        return await requeue_stale(conn, older_than_hours)
+    finally:
+        await conn.close()
+
+
+def run_worker_process(worker_id, options):
+
+    # spawned processes start untraced: open the file here
+    tracer.configure(options["trace"])
+
+    try:
+        asyncio.run(worker(worker_id, options))
+    finally:
+        tracer.close()
+
+
+# -----------------------------
+# CRAWL ENGINE
+# (N processes sharded via SKIP LOCKED)
+# -----------------------------
+def run_crawler(processes, options):
+
+    if processes == 1:
+        run_worker_process(0, options)
+        return True
+
+    # spawn: never fork a process that may hold playwright/asyncio state
+    mp = multiprocessing.get_context("spawn")
+
+    procs = [
+        mp.Process(target=run_worker_process, args=(i, options))
+        for i in range(processes)
+    ]
+
+    for proc in procs:
+        proc.start()
+
+    for proc in procs:
+        proc.join()
+
+    return all(proc.exitcode == 0 for proc in procs)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def parse_parallel(value):
+
+    try:
+        processes, contexts = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected PROCESSESxCONTEXTS, e.g. 4x3"
+        )
+
+    if processes < 1 or contexts < 1:
+        raise argparse.ArgumentTypeError("both values must be >= 1")
+
+    return processes, contexts
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description="Multi-page portfolio crawler"
+    )
+
+    parser.add_argument(
+        "--parallel",
+        type=parse_parallel,
+        default=(PROCESSES, CONTEXTS_PER_PROCESS),
+        metavar="PxC",
+        help="worker processes x browser contexts per process (default: "
+             f"{PROCESSES}x{CONTEXTS_PER_PROCESS})"
+    )
+
+    parser.add_argument(
+        "--recycle-after",
+        type=int,
+        default=PAGES_PER_CONTEXT,
+        metavar="PAGES",
+        help="recycle a browser context after this many pages"
+    )
+
+    parser.add_argument(
+        "--no-block",
+        action="store_true",
+        help="load every asset (disables image/font/media/tracker blocking)"
+    )
+
+    parser.add_argument(
+        "--browser-only",
+        action="store_true",
+        help="skip the plain-HTTP fast path and render every page"
+    )
+
+    parser.add_argument(
+        "--open-pages",
+        type=int,
+        default=MAX_OPEN_PAGES,
+        metavar="N",
+        help="max browser tabs open at once per process"
+    )
+
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep browsers warm and wait for new portfolios "
+             "(LISTEN/NOTIFY) instead of exiting when the queue is empty"
+    )
+
+    parser.add_argument(
+        "--sweep-seconds",
+        type=float,
+        default=SWEEP_SECONDS,
+        metavar="S",
+        help="daemon mode: poll the queue this often even without a NOTIFY"
+    )
+
+    parser.add_argument(
+        "--trace",
+        default=os.getenv("CRAWL_TRACE_FILE"),
+        metavar="PATH",
+        help="append per-phase timing spans and per-portfolio rollups "
+             "to this JSONL file (off by default; env CRAWL_TRACE_FILE)"
+    )
+
+    parser.add_argument(
+        "--bm25-index",
+        default=os.getenv("BM25_INDEX_DIR"),
+        metavar="DIR",
+        help="add completed portfolios to this BM25 index directory as they "
+             "finish (off by default; env BM25_INDEX_DIR)"
+    )
+
+    parser.add_argument(
+        "--reextract",
+        type=int,
+        nargs="?",
+        const=os.cpu_count() or 1,
+        default=None,
+        metavar="PROCESSES",
+        help="rebuild cleaned_data for all completed portfolios from stored "
+             "HTML snapshots (no browser, no network), then exit"
+    )
+
+    parser.add_argument(
+        "--recrawl-older-than",
+        type=float,
+        metavar="HOURS",
+        help="requeue completed portfolios last scraped more than HOURS ago "
+             "(unchanged pages are revalidated, not re-rendered)"
+    )
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    processes, contexts = args.parallel
+
+    if args.reextract is not None:
+        print(f"\n🗜️ Re-extracting from snapshots ({args.reextract} processes)...\n")
+        asyncio.run(reextract_all(args.reextract))
+        sys.exit(0)
+
+    print("\n🚀 Starting PRO Multi-Page Portfolio Crawler...")
+    print(f"   ⚙️ {processes} process(es) x {contexts} context(s)\n")
+
+    if args.recrawl_older_than is not None:
+        requeued = asyncio.run(requeue_stale_portfolios(args.recrawl_older_than))
+        print(f"   ♻️ requeued {requeued} stale portfolio(s)\n")
+
+    options = {
+        "contexts": contexts,
+        "pages_per_context": args.recycle_after,
+        "block_resources": not args.no_block,
+        "http_first": not args.browser_only,
+        "max_open_pages": args.open_pages,
+        "daemon": args.daemon,
+        "sweep_seconds": args.sweep_seconds,
+        "trace": args.trace,
+        "bm25_index": args.bm25_index,
+    }
+
+    ok = run_crawler(processes, options)
+
+    if not ok:
+        print("\n❌ One or more crawler processes failed.\n")
+        sys.exit(1)
 
-if __name__ == "__main__":
-    print("\n🚀 Starting PRO Multi-Page Portfolio Crawler...\n")
-    asyncio.run(worker())
     print("\n🎉 Crawling Complete.\n")
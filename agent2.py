@@ -1,7 +1,12 @@
 import os
 import asyncio
+import hashlib
+import argparse
 import asyncpg
 from dotenv import load_dotenv
+from rubrics import RubricCache, role_query, fetch_job_descriptions
+from bulkdb import bulk_update, bulk_upsert
+import bm25
 
 load_dotenv()
 
@@ -15,232 +20,335 @@ DB_CONFIG = {
 
 
 ############################################
-# ROLE → SKILL MAP
+# ROLE RUBRICS
+# skills, weights and bonus signals per role come
+# from the roles table (rubrics.DEFAULT_ROLES seeds
+# it); scores land in role_scores, one row per
+# portfolio and role
 ############################################
 
-ROLE_SKILLS = {
-
-    "backend": {
-
-        "must_have": [
-            "python",
-            "fastapi",
-            "django",
-            "node",
-            "sql",
-            "mongodb",
-            "api",
-            "backend"
-        ],
-
-        "good_to_have": [
-            "docker",
-            "kubernetes",
-            "aws",
-            "redis",
-            "postgres",
-            "microservices"
-        ]
-    },
-
-    "ai": {
-
-        "must_have": [
-            "python",
-            "machine learning",
-            "deep learning",
-            "llm",
-            "tensorflow",
-            "pytorch",
-            "ai",
-        ],
-
-        "good_to_have": [
-            "rag",
-            "vector database",
-            "transformers",
-            "nlp",
-            "computer vision",
-            "genai"
-        ]
-    }
+# agents 3/4 and the dashboard read these portfolio columns
+MIRRORED_COLUMNS = {
+    "backend": "backend_score",
+    "ai": "ai_score",
 }
 
+# portfolios whose text is held in memory at once; above
+# rubrics.PARALLEL_MIN_TEXTS so a full batch matches on all CPUs
+SCORE_BATCH = 2000
+
+RUBRICS = RubricCache()
+
 
 ############################################
-# SCORING FUNCTION
+# FETCH CANDIDATES
 ############################################
 
-def score_candidate(cleaned_text, role):
+# agent1 stores sha256(cleaned_data); rows crawled before that get it here
+CONTENT_HASH_SQL = """
+    COALESCE(
+        content_hash,
+        encode(sha256(convert_to(COALESCE(cleaned_data, ''), 'UTF8')), 'hex')
+    )
+"""
+
+
+async def fetch_stale(conn, rubric):
+
+    # (portfolio, roles to score): a role is stale when it was never
+    # scored, the text changed, or its rubric changed. only ids and
+    # hashes here, the texts are fetched batch by batch
+    return await conn.fetch(f"""
+        WITH r(role, version) AS (
+            SELECT * FROM unnest($1::text[], $2::text[])
+        ),
+        p AS (
+            SELECT id, {CONTENT_HASH_SQL} AS content_hash
+            FROM portfolios
+            WHERE status='completed'
+        )
+        SELECT p.id, array_agg(r.role ORDER BY r.role) AS roles
+        FROM p
+        CROSS JOIN r
+        LEFT JOIN role_scores s
+            ON s.portfolio_id = p.id
+           AND s.role = r.role
+        WHERE s.scored_hash IS DISTINCT FROM p.content_hash
+           OR s.rubric_version IS DISTINCT FROM r.version
+        GROUP BY p.id
+        ORDER BY p.id;
+    """, rubric.names, [rubric.versions[name] for name in rubric.names])
+
+
+async def fetch_texts(conn, ids):
+
+    # hash read with the text, so what is stored matches what was scored
+    return await conn.fetch(f"""
+        SELECT id,
+               candidate_name,
+               cleaned_data,
+               {CONTENT_HASH_SQL} AS content_hash
+        FROM portfolios
+        WHERE id = ANY($1::int[])
+        ORDER BY id;
+    """, ids)
 
-    if not cleaned_text:
-        return 0
 
-    role_data = ROLE_SKILLS[role]
+async def count_completed(conn):
+    return await conn.fetchval("""
+        SELECT COUNT(*) FROM portfolios WHERE status='completed';
+    """)
 
-    text = cleaned_text.lower()
 
-    score = 0
+############################################
+# UPDATE SCORES
+############################################
 
-    MUST_WEIGHT = 12
-    GOOD_WEIGHT = 5
+async def update_scores(conn, versions, candidates, scores):
+
+    # versions: role -> version the scores were produced with;
+    # one row per (portfolio, role), written in one statement
+    rows = [
+        (c["id"], role, scores[role][i], c["content_hash"], version)
+        for role, version in versions.items()
+        for i, c in enumerate(candidates)
+    ]
+
+    written = await bulk_upsert(
+        conn,
+        "role_scores",
+        ["portfolio_id", "role"],
+        ["score", "scored_hash", "rubric_version"],
+        rows,
+        set_extra={"scored_at": "(NOW() AT TIME ZONE 'UTC')"}
+    )
 
-    must_hits = 0
-    good_hits = 0
+    # mirror the built-in roles onto portfolios for the later agents
+    mirrored = [role for role in versions if role in MIRRORED_COLUMNS]
 
-    # MUST SKILLS
-    for skill in role_data["must_have"]:
-        if skill in text:
-            score += MUST_WEIGHT
-            must_hits += 1
+    if mirrored:
+        await bulk_update(
+            conn,
+            "portfolios",
+            "id",
+            [MIRRORED_COLUMNS[role] for role in mirrored],
+            [
+                (c["id"], *[scores[role][i] for role in mirrored])
+                for i, c in enumerate(candidates)
+            ],
+            set_extra={"scored_at": "(NOW() AT TIME ZONE 'UTC')"}
+        )
 
-    # GOOD SKILLS
-    for skill in role_data["good_to_have"]:
-        if skill in text:
-            score += GOOD_WEIGHT
-            good_hits += 1
+    return written
 
 
-    ########################################
-    # BONUS SIGNALS (VERY IMPORTANT)
-    ########################################
+async def prune_roles(conn, rubric):
 
-    if "project" in text:
-        score += 8
+    # scores of roles that were removed or deactivated
+    result = await conn.execute("""
+        DELETE FROM role_scores
+        WHERE role <> ALL($1::text[]);
+    """, rubric.names)
 
-    if "experience" in text:
-        score += 6
+    return int(result.split()[-1])
 
-    if "github" in text:
-        score += 4
 
-    if "deployed" in text or "production" in text:
-        score += 6
+############################################
+# BM25 MODE (--bm25)
+# ranks every portfolio against each role's job
+# description (roles.jd) with the on-disk BM25
+# index instead of counting rubric skills
+############################################
 
+def bm25_version(query):
 
-    ########################################
-    # NORMALIZATION
-    ########################################
+    # corpus statistics move with every crawl, so bm25 scores are
+    # always recomputed; the version only tells them apart from
+    # rubric scores (a later rubric run rescores them)
+    key = f"{bm25.K1}:{bm25.B}:{query}"
+    return "bm25:" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:11]
 
-    max_score = (
-        len(role_data["must_have"]) * MUST_WEIGHT +
-        len(role_data["good_to_have"]) * GOOD_WEIGHT +
-        24
-    )
 
-    normalized = round((score / max_score) * 100, 2)
+async def bm25_scoring(conn, rubric, index_dir):
 
-    return normalized
+    added, removed = await bm25.sync_index(conn, index_dir)
 
+    print(f"   📚 BM25 index synced: {added} added/updated, {removed} removed")
 
-############################################
-# FETCH CANDIDATES
-############################################
+    index = await asyncio.to_thread(bm25.BM25Index, index_dir)
+    jds = await fetch_job_descriptions(conn)
 
-async def fetch_candidates(conn):
+    completed = {
+        r["id"]
+        for r in await conn.fetch("""
+            SELECT id FROM portfolios WHERE status='completed';
+        """)
+    }
 
-    rows = await conn.fetch("""
-        SELECT id, candidate_name, cleaned_data
-        FROM portfolios
-        WHERE status='completed';
-    """)
+    # the index can briefly hold a portfolio that was just requeued
+    keep = [i for i, pid in enumerate(index.pids.tolist()) if pid in completed]
+
+    candidates = [
+        {"id": int(index.pids[i]), "content_hash": str(index.hashes[i])}
+        for i in keep
+    ]
+
+    scores, versions = {}, {}
 
-    return rows
+    for role in rubric.names:
+
+        query = role_query(rubric.roles[role], jds.get(role))
+        raw, ceiling = index.score_all(query)
+
+        # share of the best score this query can reach, 0-100
+        scores[role] = [
+            round(float(raw[i]) / ceiling * 100, 2) if ceiling else 0
+            for i in keep
+        ]
+        versions[role] = bm25_version(query)
+
+        source = "job description" if jds.get(role) else "rubric skills"
+        print(f"   🔎 {role}: ranked {len(keep)} portfolios against its {source}")
+
+    await update_scores(conn, versions, candidates, scores)
 
 
 ############################################
-# UPDATE SCORES
+# LEADERBOARD
 ############################################
 
-async def update_scores(conn, candidate_id, backend_score, ai_score):
+async def print_leaderboard(conn, rubric):
+
+    for role in rubric.names:
 
-    await conn.execute("""
-        UPDATE portfolios
-        SET backend_score=$1,
-            ai_score=$2
-        WHERE id=$3;
-    """, backend_score, ai_score, candidate_id)
+        print("\n==============================")
+        print(f"🏆 {role.upper()} RANKING")
+        print("==============================\n")
+
+        rows = await conn.fetch("""
+            SELECT p.candidate_name, s.score
+            FROM role_scores s
+            JOIN portfolios p ON p.id = s.portfolio_id
+            WHERE s.role = $1
+              AND s.score > 0
+            ORDER BY s.score DESC;
+        """, role)
+
+        for i, r in enumerate(rows, start=1):
+            print(f"{i}. {r['candidate_name']} → {r['score']}")
 
 
 ############################################
-# LEADERBOARD
+# MAIN AGENT
 ############################################
 
-async def print_leaderboard(conn):
+def group_by_roles(stale):
 
-    print("\n==============================")
-    print("🏆 BACKEND ENGINEER RANKING")
-    print("==============================\n")
+    # portfolios needing the same roles are scored together, so a
+    # new role is backfilled with a matcher over its terms only
+    groups = {}
 
-    rows = await conn.fetch("""
-        SELECT candidate_name, backend_score
-        FROM portfolios
-        WHERE backend_score > 0
-        ORDER BY backend_score DESC;
-    """)
+    for row in stale:
+        groups.setdefault(tuple(row["roles"]), []).append(row["id"])
 
-    for i, r in enumerate(rows, start=1):
-        print(f"{i}. {r['candidate_name']} → {r['backend_score']}")
+    return groups
 
 
+async def score_pass(conn, rubric, stale):
 
-    print("\n==============================")
-    print("🤖 AI ENGINEER RANKING")
-    print("==============================\n")
+    # False when the rubric changed mid-run: the caller starts over
+    for roles, ids in group_by_roles(stale).items():
 
-    rows = await conn.fetch("""
-        SELECT candidate_name, ai_score
-        FROM portfolios
-        WHERE ai_score > 0
-        ORDER BY ai_score DESC;
-    """)
+        part = rubric.subset(roles)
 
-    for i, r in enumerate(rows, start=1):
-        print(f"{i}. {r['candidate_name']} → {r['ai_score']}")
+        if part is not rubric:
+            print(f"🧩 Backfilling {', '.join(roles)} for {len(ids)} portfolios")
 
+        for start in range(0, len(ids), SCORE_BATCH):
 
-############################################
-# MAIN AGENT
-############################################
+            if await RUBRICS.get(conn) is not rubric:
+                return False
 
-async def scoring_agent():
+            candidates = await fetch_texts(conn, ids[start:start + SCORE_BATCH])
 
-    conn = await asyncpg.connect(**DB_CONFIG)
+            scores = part.score_batch([c["cleaned_data"] for c in candidates])
+
+            await update_scores(conn, part.versions, candidates, scores)
+
+            for i, c in enumerate(candidates):
+                print(
+                    f"✅ {c['candidate_name']} | "
+                    + " | ".join(f"{role}={scores[role][i]}" for role in part.names)
+                )
+
+    return True
+
+
+async def scoring_agent(use_bm25=False, index_dir=bm25.INDEX_DIR):
 
-    candidates = await fetch_candidates(conn)
+    conn = await asyncpg.connect(**DB_CONFIG)
 
     print("\n🚀 Starting Role-Based Scoring...\n")
 
-    for c in candidates:
+    if use_bm25:
+        rubric = await RUBRICS.get(conn)
+        await bm25_scoring(conn, rubric, index_dir)
+        await print_leaderboard(conn, rubric)
+        await conn.close()
+        return
 
-        backend_score = score_candidate(
-            c["cleaned_data"],
-            "backend"
-        )
+    completed = await count_completed(conn)
 
-        ai_score = score_candidate(
-            c["cleaned_data"],
-            "ai"
-        )
+    while True:
 
-        await update_scores(
-            conn,
-            c["id"],
-            backend_score,
-            ai_score
-        )
+        rubric = await RUBRICS.get(conn)
+        stale = await fetch_stale(conn, rubric)
 
         print(
-            f"✅ {c['candidate_name']} | "
-            f"Backend={backend_score} | AI={ai_score}"
+            f"   📐 rubric {rubric.version} ({', '.join(rubric.names)}): "
+            f"{len(stale)} of {completed} completed portfolios to score\n"
         )
 
-    await print_leaderboard(conn)
+        if not stale:
+            print("✅ No new or changed portfolios to score.")
+            break
+
+        if await score_pass(conn, rubric, stale):
+            break
+
+    pruned = await prune_roles(conn, rubric)
+
+    if pruned:
+        print(f"🧹 Removed {pruned} scores of retired roles")
+
+    await print_leaderboard(conn, rubric)
 
     await conn.close()
 
 
 ############################################
 
+def parse_args():
+
+    parser = argparse.ArgumentParser(description="Role-based candidate scoring")
+
+    parser.add_argument(
+        "--bm25",
+        action="store_true",
+        help="rank every portfolio against each role's job description "
+             "(roles.jd) with BM25 instead of the skill rubric"
+    )
+
+    parser.add_argument(
+        "--bm25-index",
+        default=bm25.INDEX_DIR,
+        metavar="DIR",
+        help=f"BM25 index directory (default: {bm25.INDEX_DIR}; env BM25_INDEX_DIR)"
+    )
+
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(scoring_agent())
+    args = parse_args()
+    asyncio.run(scoring_agent(args.bm25, args.bm25_index))
@@ -1,9 +1,13 @@
 import os
 import asyncio
+import argparse
 import asyncpg
 import httpx
 import json
 from dotenv import load_dotenv
+from bulkdb import bulk_update
+from rubrics import RubricCache, role_query, fetch_job_descriptions
+import embeddings
 
 load_dotenv()
 
@@ -28,12 +32,37 @@ FINAL_AI_WEIGHT = 0.35
 DELAY_BETWEEN_CALLS = 4
 MAX_RETRIES = 3
 
+# candidates sent to the LLM per run
+EVAL_BATCH = 5
+
+# --prefilter: roles the prompt evaluates, and how close (cosine, local
+# embeddings) a portfolio must be to one of them to be worth a call
+PREFILTER_ROLES = ["backend", "ai"]
+PREFILTER_MIN_SIMILARITY = 0.2
+
 
 ############################################
 # FETCH TOP UNEVALUATED CANDIDATES
 ############################################
 
-async def fetch_candidates(conn):
+async def fetch_candidates(conn, ids=None):
+
+    if ids is not None:
+
+        # prefiltered: in the order the prefilter ranked them
+        rows = await conn.fetch("""
+            SELECT id,
+                   candidate_name,
+                   cleaned_data,
+                   backend_score,
+                   ai_score
+            FROM portfolios
+            WHERE id = ANY($1::int[]);
+        """, ids)
+
+        position = {pid: i for i, pid in enumerate(ids)}
+
+        return sorted(rows, key=lambda r: position[r["id"]])
 
     rows = await conn.fetch("""
         SELECT id,
@@ -48,12 +77,75 @@ async def fetch_candidates(conn):
             COALESCE(backend_score,0),
             COALESCE(ai_score,0)
         ) DESC
-        LIMIT 5;
-    """)
+        LIMIT $1;
+    """, EVAL_BATCH)
 
     return rows
 
 
+############################################
+# EMBEDDING PREFILTER (--prefilter)
+# ranks unevaluated candidates by local embedding
+# similarity to the roles the prompt evaluates;
+# only close ones are worth an LLM call
+############################################
+
+async def prefilter_candidates(conn, index_dir, min_similarity):
+
+    embedded, _ = await embeddings.sync_embeddings(conn, index_dir)
+
+    if embedded:
+        print(f"🧭 Embedded {embedded} new/changed portfolios")
+
+    index = await asyncio.to_thread(embeddings.EmbeddingIndex, index_dir)
+
+    rubric = await RubricCache().get(conn)
+    jds = await fetch_job_descriptions(conn)
+
+    pending = {
+        r["id"]
+        for r in await conn.fetch("""
+            SELECT id
+            FROM portfolios
+            WHERE final_backend_score IS NULL
+            AND cleaned_data IS NOT NULL;
+        """)
+    }
+
+    roles = [role for role in PREFILTER_ROLES if role in rubric.roles]
+
+    if not roles:
+        print(
+            f"⚠️ Prefilter: none of {', '.join(PREFILTER_ROLES)} is an active role, "
+            f"nothing to rank {len(pending)} unevaluated candidates against"
+        )
+        return []
+
+    # closeness to the nearest role, per indexed portfolio
+    per_role = [
+        index.similarities(role_query(rubric.roles[role], jds.get(role))).tolist()
+        for role in roles
+    ]
+
+    relevance = [max(sims) for sims in zip(*per_role)]
+
+    ranked = sorted(
+        (
+            (sim, pid)
+            for pid, sim in zip(index.ids.tolist(), relevance)
+            if pid in pending and sim >= min_similarity
+        ),
+        reverse=True
+    )
+
+    print(
+        f"🧲 Prefilter: {len(ranked)} of {len(pending)} unevaluated candidates "
+        f"close to a role (similarity ≥ {min_similarity})"
+    )
+
+    return [pid for _, pid in ranked[:EVAL_BATCH]]
+
+
 ############################################
 # PROMPT
 ############################################
@@ -210,34 +302,23 @@ def final_score(rule, ai):
 # UPDATE DB
 ############################################
 
-async def update_scores(
-    conn,
-    candidate_id,
-    ai_backend,
-    ai_ai,
-    final_backend,
-    final_ai,
-    backend_rec,
-    ai_rec
-):
-
-    await conn.execute("""
-        UPDATE portfolios
-        SET ai_backend_score=$1,
-            ai_ai_score=$2,
-            final_backend_score=$3,
-            final_ai_score=$4,
-            backend_recommendation=$5,
-            ai_recommendation=$6
-        WHERE id=$7;
-    """,
-        ai_backend,
-        ai_ai,
-        final_backend,
-        final_ai,
-        backend_rec,
-        ai_rec,
-        candidate_id
+async def update_scores(conn, rows):
+
+    # rows: [(id, ai_backend, ai_ai, final_backend, final_ai,
+    #         backend_rec, ai_rec)], written in one statement
+    return await bulk_update(
+        conn,
+        "portfolios",
+        "id",
+        [
+            "ai_backend_score",
+            "ai_ai_score",
+            "final_backend_score",
+            "final_ai_score",
+            "backend_recommendation",
+            "ai_recommendation",
+        ],
+        rows
     )
 
 
@@ -279,11 +360,17 @@ async def leaderboard(conn):
 # MAIN AGENT
 ############################################
 
-async def ai_agent():
+async def ai_agent(prefilter=False, index_dir=embeddings.INDEX_DIR,
+                   min_similarity=PREFILTER_MIN_SIMILARITY):
 
     conn = await asyncpg.connect(**DB_CONFIG)
 
-    candidates = await fetch_candidates(conn)
+    ids = None
+
+    if prefilter:
+        ids = await prefilter_candidates(conn, index_dir, min_similarity)
+
+    candidates = await fetch_candidates(conn, ids)
 
     if not candidates:
         print("\n✅ No candidates require AI evaluation.\n")
@@ -292,39 +379,45 @@ async def ai_agent():
 
     print("\n🚀 Starting AI Evaluation...\n")
 
-    for c in candidates:
+    evaluated = []
 
-        print(f"Evaluating → {c['candidate_name']}")
+    try:
+        for c in candidates:
 
-        prompt = build_prompt(c["cleaned_data"])
+            print(f"Evaluating → {c['candidate_name']}")
 
-        content = await call_ai(prompt)
+            prompt = build_prompt(c["cleaned_data"])
 
-        parsed = parse_json(content)
+            content = await call_ai(prompt)
 
-        if not parsed:
-            print("⚠️ Skipping candidate\n")
-            continue
+            parsed = parse_json(content)
 
-        ai_backend, ai_ai, backend_rec, ai_rec = compute_ai_scores(parsed)
+            if not parsed:
+                print("⚠️ Skipping candidate\n")
+                continue
 
-        final_backend = final_score(c["backend_score"], ai_backend)
-        final_ai = final_score(c["ai_score"], ai_ai)
+            ai_backend, ai_ai, backend_rec, ai_rec = compute_ai_scores(parsed)
 
-        await update_scores(
-            conn,
-            c["id"],
-            ai_backend,
-            ai_ai,
-            final_backend,
-            final_ai,
-            backend_rec,
-            ai_rec
-        )
+            final_backend = final_score(c["backend_score"], ai_backend)
+            final_ai = final_score(c["ai_score"], ai_ai)
+
+            evaluated.append((
+                c["id"],
+                ai_backend,
+                ai_ai,
+                final_backend,
+                final_ai,
+                backend_rec,
+                ai_rec
+            ))
+
+            print("✅ Done\n")
 
-        print("✅ Done\n")
+            await asyncio.sleep(DELAY_BETWEEN_CALLS)
 
-        await asyncio.sleep(DELAY_BETWEEN_CALLS)
+    finally:
+        # paid-for evaluations are written even if a later call crashes
+        await update_scores(conn, evaluated)
 
     await leaderboard(conn)
 
@@ -333,5 +426,34 @@ async def ai_agent():
 
 ############################################
 
+def parse_args():
+
+    parser = argparse.ArgumentParser(description="LLM evaluation of top candidates")
+
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help="pick candidates by local embedding similarity to the roles "
+             "instead of rule score, skipping those not close to any role"
+    )
+
+    parser.add_argument(
+        "--min-similarity",
+        type=float,
+        default=PREFILTER_MIN_SIMILARITY,
+        help=f"prefilter cutoff, cosine similarity (default {PREFILTER_MIN_SIMILARITY})"
+    )
+
+    parser.add_argument(
+        "--embed-index",
+        default=embeddings.INDEX_DIR,
+        metavar="DIR",
+        help=f"embedding index directory (default: {embeddings.INDEX_DIR}; env EMBED_INDEX_DIR)"
+    )
+
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    asyncio.run(ai_agent())
+    args = parse_args()
+    asyncio.run(ai_agent(args.prefilter, args.embed_index, args.min_similarity))
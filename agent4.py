@@ -2,6 +2,7 @@ import os
 import asyncio
 import asyncpg
 from dotenv import load_dotenv
+from bulkdb import bulk_update
 
 load_dotenv()
 
@@ -54,12 +55,15 @@ async def fetch_candidates(conn):
     """)
 
 
-async def update_shortlist(conn, shortlist, candidate_id):
-    await conn.execute("""
-        UPDATE portfolios
-        SET shortlist_status = $1
-        WHERE id = $2
-    """, shortlist, candidate_id)
+async def update_shortlist(conn, rows):
+    # rows: [(id, shortlist_status)], one statement for all
+    return await bulk_update(
+        conn,
+        "portfolios",
+        "id",
+        ["shortlist_status"],
+        rows
+    )
 
 
 async def main():
@@ -69,6 +73,8 @@ async def main():
 
     print("\n🚀 Running Auto Shortlist Agent...\n")
 
+    decisions = []
+
     for c in candidates:
 
         backend_final = c["bf"] or 0
@@ -84,10 +90,12 @@ async def main():
             ai_rec
         )
 
-        await update_shortlist(conn, shortlist, c["id"])
+        decisions.append((c["id"], shortlist))
 
         print(f"{c['candidate_name']}: {shortlist}")
 
+    await update_shortlist(conn, decisions)
+
     await conn.close()
 
     print("\n🎉 Shortlisting Complete!\n")
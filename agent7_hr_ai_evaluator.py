@@ -4,6 +4,7 @@ import asyncpg
 import httpx
 import json
 from dotenv import load_dotenv
+from bulkdb import bulk_update
 
 load_dotenv()
 
@@ -109,34 +110,41 @@ async def run_hr_ai_evaluator():
 
     print("\n🚀 Evaluating HR Answers with AI...\n")
 
-    for r in rows:
+    evaluated = []
 
-        question = r["question"]
-        answer   = r["raw_answer"]
-        criteria = r["criteria"]
+    try:
+        for r in rows:
+
+            question = r["question"]
+            answer   = r["raw_answer"]
+            criteria = r["criteria"]
 
-        prompt = build_hr_prompt(question, answer, json.dumps(criteria))
+            prompt = build_hr_prompt(question, answer, json.dumps(criteria))
 
-        content = await call_ai(prompt)
+            content = await call_ai(prompt)
 
-        parsed = parse_json(content)
+            parsed = parse_json(content)
 
-        if not parsed:
-            print("⚠️ JSON parse failed, skipping.")
-            continue
+            if not parsed:
+                print("⚠️ JSON parse failed, skipping.")
+                continue
 
-        ai_score    = parsed.get("score", 0)
-        ai_decision = parsed.get("decision", "Fail")
+            ai_score    = parsed.get("score", 0)
+            ai_decision = parsed.get("decision", "Fail")
 
-        await conn.execute("""
-            UPDATE hr_answers
-            SET processed_answer = $1,
-                ai_score = $2,
-                ai_decision = $3
-            WHERE id = $4;
-        """, answer, ai_score, ai_decision, r["id"])
+            evaluated.append((r["id"], answer, ai_score, ai_decision))
 
-        print(f"🧠 Evaluated answer {r['id']} → {ai_score},{ai_decision}")
+            print(f"🧠 Evaluated answer {r['id']} → {ai_score},{ai_decision}")
+
+    finally:
+        # one UPDATE ... FROM for every answer evaluated so far
+        await bulk_update(
+            conn,
+            "hr_answers",
+            "id",
+            ["processed_answer", "ai_score", "ai_decision"],
+            evaluated
+        )
 
     await conn.close()
 
@@ -0,0 +1,484 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import asyncio
+import threading
+import statistics
+import contextlib
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from playwright.async_api import async_playwright
+
+import agent1
+from tracing import tracer
+
+SITES = os.path.join(ROOT, "benchmarks", "fixtures", "sites")
+
+RSS_SAMPLE_SECONDS = 0.05
+
+
+# -----------------------------
+# FIXTURE SERVER
+# one server per recorded site, each on its own
+# loopback address (127.0.0.N) so the crawler's
+# per-host scheduler sees separate hosts
+# -----------------------------
+class FixtureHandler(SimpleHTTPRequestHandler):
+
+    def do_GET(self):
+
+        fault = self.server.fault
+
+        delay = fault["latency_ms"] + self.server.roll() * fault["jitter_ms"]
+
+        if delay:
+            time.sleep(delay / 1000)
+
+        path = self.path.split("?")[0]
+        flaky = not fault["fail_paths"] or path in fault["fail_paths"]
+
+        if flaky and self.server.roll() < fault["fail_rate"]:
+            self.server.failures += 1
+            self.send_error(503, "injected failure")
+            return
+
+        if path.endswith((".xml", ".txt")):
+            self.send_discovery_file(path)
+            return
+
+        super().do_GET()
+
+    def send_discovery_file(self, path):
+
+        # robots.txt / sitemap.xml need absolute URLs, and the
+        # port is only known at runtime: {{origin}} fills it in
+        file_path = self.translate_path(path)
+
+        if not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+
+        with open(file_path, encoding="utf-8") as f:
+            body = f.read().replace("{{origin}}", self.server.url.rstrip("/"))
+
+        data = body.encode("utf-8")
+        kind = "application/xml" if path.endswith(".xml") else "text/plain"
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"{kind}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, host, directory, fault, seed):
+        super().__init__((host, 0), partial(FixtureHandler, directory=directory))
+        self.fault = fault
+        self.failures = 0
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def load_fault(site_dir, args):
+
+    fault = {"latency_ms": 0, "jitter_ms": 0, "fail_rate": 0.0, "fail_paths": []}
+
+    path = os.path.join(site_dir, "site.json")
+
+    if os.path.exists(path):
+        with open(path) as f:
+            fault.update(json.load(f))
+
+    # command line wins over per-site settings
+    for key in ("latency_ms", "jitter_ms", "fail_rate"):
+        if getattr(args, key) is not None:
+            fault[key] = getattr(args, key)
+
+    return fault
+
+
+def start_servers(sites_dir, args):
+
+    sites = {}
+
+    for i, name in enumerate(sorted(os.listdir(sites_dir))):
+
+        site_dir = os.path.join(sites_dir, name)
+
+        if not os.path.exists(os.path.join(site_dir, "index.html")):
+            continue
+
+        server = FixtureServer(
+            f"127.0.0.{i + 2}",
+            site_dir,
+            load_fault(site_dir, args),
+            args.seed + i
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        golden_path = os.path.join(site_dir, "golden.txt")
+        golden = None
+
+        if os.path.exists(golden_path):
+            with open(golden_path, encoding="utf-8") as f:
+                golden = f.read()
+
+        sites[name] = {"server": server, "golden": golden}
+
+    return sites
+
+
+# -----------------------------
+# PEAK RSS (harness + browser processes)
+# sampled from /proc so Chromium's children count
+# -----------------------------
+def tree_rss_kb(root_pid):
+
+    children = {}
+
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    stack = [root_pid]
+
+    while stack:
+        pid = stack.pop()
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+        except OSError:
+            continue
+        stack.extend(children.get(pid, []))
+
+    return total
+
+
+class RssSampler(threading.Thread):
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak_kb = max(self.peak_kb, tree_rss_kb(os.getpid()))
+            self.stopped.wait(RSS_SAMPLE_SECONDS)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# -----------------------------
+# FIDELITY vs GOLDEN OUTPUT
+# word sets: formatting and order do not matter
+# -----------------------------
+WORD = re.compile(r"\w+")
+
+
+def words(text):
+    return set(WORD.findall((text or "").lower()))
+
+
+def fidelity(text, golden):
+
+    expected, got = words(golden), words(text)
+
+    if not expected:
+        return None, None
+
+    hit = len(expected & got)
+
+    return hit / len(expected), (hit / len(got) if got else 0.0)
+
+
+# -----------------------------
+# NO BROWSER
+# (Chromium not installed: every browser-tier
+#  page fails, http-tier pages still count)
+# -----------------------------
+class NoBrowserContext:
+
+    async def new_page(self):
+        raise RuntimeError("no browser available")
+
+
+# -----------------------------
+# RUN agent1 AGAINST THE CORPUS
+# -----------------------------
+async def crawl_corpus(sites, args):
+
+    blocker = None if args.no_block else agent1.ResourceBlocker()
+    http = agent1.new_http_client()
+
+    session = agent1.CrawlSession(
+        http,
+        blocker,
+        agent1.PageScheduler(max_open_pages=args.open_pages),
+        not args.browser_only
+    )
+
+    queue = asyncio.Queue()
+
+    for round_ in range(args.rounds):
+        for name in sites:
+            queue.put_nowait((queue.qsize(), round_, name))
+
+    runs = []
+    log = None if args.verbose else io.StringIO()
+
+    async with async_playwright() as p:
+
+        pool = None
+
+        if not args.no_browser:
+            try:
+                browser = await p.chromium.launch(headless=True)
+                pool = agent1.ContextPool(
+                    browser,
+                    args.contexts,
+                    agent1.PAGES_PER_CONTEXT,
+                    blocker
+                )
+                await pool.start()
+            except Exception as e:
+                print(f"⚠️ Chromium unavailable, http tier only: {e}\n")
+
+        async def slot():
+
+            while not queue.empty():
+
+                id_, round_, name = queue.get_nowait()
+                context = await pool.acquire() if pool else NoBrowserContext()
+
+                record = {
+                    "id": id_,
+                    "portfolio_url": sites[name]["server"].url,
+                    "cache": {},
+                }
+
+                started = time.monotonic()
+
+                try:
+                    with tracer.portfolio(record["id"], record["portfolio_url"]):
+                        result = await agent1.scrape_portfolio(
+                            context, record, session
+                        )
+                finally:
+                    if pool:
+                        await pool.release(context)
+
+                pages = [pg for pg in result["pages"] if pg["tier"] != "failed"]
+                recall, precision = fidelity(result["text"], sites[name]["golden"])
+
+                runs.append({
+                    "site": name,
+                    "round": round_,
+                    "status": result["status"],
+                    "seconds": time.monotonic() - started,
+                    "pages": len(pages),
+                    "tiers": [pg["tier"] for pg in result["pages"]],
+                    "chars": len(result["text"] or ""),
+                    "recall": recall,
+                    "precision": precision,
+                })
+
+        started = time.monotonic()
+
+        with contextlib.redirect_stdout(log) if log else contextlib.nullcontext():
+            await asyncio.gather(*[slot() for _ in range(args.contexts)])
+
+        wall = time.monotonic() - started
+
+        if pool:
+            await pool.close()
+
+    await http.aclose()
+
+    return runs, wall
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+def percentile(values, p):
+    values = sorted(values)
+    return values[int(p * (len(values) - 1))] if values else 0.0
+
+
+def mean(values):
+    values = [v for v in values if v is not None]
+    return statistics.mean(values) if values else None
+
+
+def fmt_ratio(value):
+    return "-" if value is None else f"{value:.1%}"
+
+
+def report(runs, wall, peak_kb, sites):
+
+    header = (
+        f"{'site':<16} {'runs':>5} {'ok':>4} {'pages':>6} {'p50 s':>7} "
+        f"{'p95 s':>7} {'recall':>8} {'precision':>10} {'503s':>5}  tiers"
+    )
+    print(header)
+    print("-" * len(header))
+
+    for name in sites:
+
+        mine = [r for r in runs if r["site"] == name]
+        seconds = [r["seconds"] for r in mine]
+
+        tiers = {}
+        for r in mine:
+            for tier in r["tiers"]:
+                tiers[tier] = tiers.get(tier, 0) + 1
+
+        print(
+            f"{name:<16} {len(mine):>5} "
+            f"{sum(r['status'] == 'completed' for r in mine):>4} "
+            f"{sum(r['pages'] for r in mine):>6} "
+            f"{percentile(seconds, 0.5):>7.2f} {percentile(seconds, 0.95):>7.2f} "
+            f"{fmt_ratio(mean(r['recall'] for r in mine)):>8} "
+            f"{fmt_ratio(mean(r['precision'] for r in mine)):>10} "
+            f"{sites[name]['server'].failures:>5}  "
+            + " ".join(f"{t}={n}" for t, n in sorted(tiers.items()))
+        )
+
+    seconds = [r["seconds"] for r in runs]
+    pages = sum(r["pages"] for r in runs)
+
+    summary = {
+        "portfolios": len(runs),
+        "pages": pages,
+        "wall_seconds": wall,
+        "pages_per_second": pages / wall if wall else 0.0,
+        "p50_seconds": percentile(seconds, 0.5),
+        "p95_seconds": percentile(seconds, 0.95),
+        "peak_rss_mb": peak_kb / 1024,
+        "recall": mean(r["recall"] for r in runs),
+        "precision": mean(r["precision"] for r in runs),
+    }
+
+    print(
+        f"\n📊 {summary['portfolios']} portfolios, {pages} pages in {wall:.1f}s "
+        f"-> {summary['pages_per_second']:.2f} pages/s"
+    )
+    print(
+        f"   ⏱️ per portfolio: p50={summary['p50_seconds']:.2f}s "
+        f"p95={summary['p95_seconds']:.2f}s"
+    )
+    print(f"   🧠 peak RSS (harness + browser): {summary['peak_rss_mb']:.0f} MB")
+    print(
+        f"   🎯 fidelity vs golden: recall={fmt_ratio(summary['recall'])} "
+        f"precision={fmt_ratio(summary['precision'])}"
+    )
+
+    return summary
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Offline crawl benchmark: agent1 against recorded sites "
+                    "served from 127.0.0.0/8"
+    )
+    parser.add_argument("--sites", default=SITES)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--contexts", type=int, default=agent1.CONTEXTS_PER_PROCESS)
+    parser.add_argument("--open-pages", type=int, default=agent1.MAX_OPEN_PAGES)
+    parser.add_argument(
+        "--latency-ms", type=float, default=None,
+        help="added to every response (overrides site.json)"
+    )
+    parser.add_argument("--jitter-ms", type=float, default=None)
+    parser.add_argument(
+        "--fail-rate", type=float, default=None,
+        help="fraction of requests answered with 503 (overrides site.json)"
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-block", action="store_true")
+    parser.add_argument("--browser-only", action="store_true")
+    parser.add_argument(
+        "--no-browser", action="store_true",
+        help="skip Chromium: JS-only pages fail, http tier is measured alone"
+    )
+    parser.add_argument("--json", metavar="PATH", help="write results as JSON")
+    parser.add_argument(
+        "--trace", metavar="PATH",
+        help="append agent1's per-phase spans to this JSONL file"
+    )
+    parser.add_argument("--verbose", action="store_true", help="show crawler logs")
+    args = parser.parse_args()
+
+    sites = start_servers(args.sites, args)
+
+    if not sites:
+        print(f"❌ No sites in {args.sites}")
+        sys.exit(1)
+
+    print(
+        f"\n📐 {len(sites)} sites x {args.rounds} rounds, "
+        f"contexts={args.contexts} open_pages={args.open_pages}\n"
+    )
+
+    tracer.configure(args.trace)
+
+    sampler = RssSampler()
+    sampler.start()
+
+    try:
+        runs, wall = asyncio.run(crawl_corpus(sites, args))
+    finally:
+        sampler.stop()
+        tracer.close()
+        for site in sites.values():
+            site["server"].shutdown()
+
+    summary = report(runs, wall, sampler.peak_kb, sites)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": summary, "runs": runs}, f, indent=2)
+        print(f"\n💾 results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import statistics
+import tracemalloc
+import multiprocessing
+from glob import glob
+from urllib.parse import urljoin, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import extract
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "html")
+BASE_URL = "https://portfolio.example.com/"
+
+
+# -----------------------------
+# LEGACY PATH
+# (agent1 before the single-pass extractor:
+#  html.parser twice on the homepage)
+# -----------------------------
+def legacy_clean_html(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(["script", "style", "noscript"]):
+        tag.extract()
+
+    return soup.get_text(separator=" ", strip=True)
+
+
+def legacy_get_internal_links(base_url, html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    base_domain = urlparse(base_url).netloc
+    links = set()
+
+    for a in soup.find_all("a", href=True):
+        full_url = urljoin(base_url, a["href"])
+
+        if urlparse(full_url).netloc == base_domain:
+            links.add(full_url.split("#")[0])
+
+    return list(links)
+
+
+def run_legacy(html):
+    links = legacy_get_internal_links(BASE_URL, html)
+    text = legacy_clean_html(html)
+    return text, links
+
+
+def make_runner(backend):
+    return lambda html: extract.parse_page(html, backend)
+
+
+def methods():
+
+    found = {}
+
+    try:
+        import bs4  # noqa: F401
+        found["legacy (bs4 x2)"] = "legacy"
+    except ImportError:
+        print("⚠️ bs4 not installed: skipping the legacy baseline")
+
+    for backend in extract.AVAILABLE:
+        found[f"parse_page ({backend})"] = backend
+
+    return found
+
+
+def runner_for(method):
+    return run_legacy if method == "legacy" else make_runner(method)
+
+
+# -----------------------------
+# FIXTURES
+# -----------------------------
+def inflate(html, scale):
+
+    start = html.find("<body")
+    start = html.find(">", start) + 1
+    end = html.rfind("</body>")
+
+    if start <= 0 or end < start:
+        return html
+
+    return html[:start] + html[start:end] * scale + html[end:]
+
+
+def load_fixtures(directory, scale):
+
+    fixtures = {}
+
+    for path in sorted(glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            fixtures[os.path.basename(path)] = inflate(f.read(), scale)
+
+    return fixtures
+
+
+# -----------------------------
+# MEASURE
+# (each method in a fresh process so
+#  peak RSS is not shared between them)
+# -----------------------------
+def measure(args):
+
+    method, html, repeat = args
+    run = runner_for(method)
+
+    run(html)  # warm-up: imports, caches
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text, _ = run(html)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    run(html)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "median_ms": statistics.median(timings),
+        "p95_ms": sorted(timings)[int(0.95 * (len(timings) - 1))],
+        "py_peak_kb": py_peak / 1024,
+        "rss_growth_kb": rss_after - rss_before,  # linux: KB
+        "words": set(text.split()),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="Parse-time / memory benchmark for HTML extraction"
+    )
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=10,
+        help="repeat each fixture body N times to simulate long pages"
+    )
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures, args.scale)
+
+    if not fixtures:
+        print(f"❌ No fixtures in {args.fixtures}")
+        sys.exit(1)
+
+    found = methods()
+
+    if not found:
+        print("❌ No HTML parser installed.")
+        sys.exit(1)
+
+    mp = multiprocessing.get_context("spawn")
+
+    print(
+        f"\n📐 repeat={args.repeat} scale={args.scale} "
+        f"default backend={extract.BACKEND}\n"
+    )
+
+    header = (
+        f"{'fixture':<24} {'method':<24} {'median ms':>10} {'p95 ms':>9} "
+        f"{'py peak KB':>11} {'rss +KB':>9} {'words vs legacy':>16}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    for name, html in fixtures.items():
+
+        baseline = None
+
+        for label, method in found.items():
+
+            with mp.Pool(1) as pool:
+                r = pool.apply(measure, ((method, html, args.repeat),))
+
+            if method == "legacy":
+                baseline = r["words"]
+
+            if baseline is None or method == "legacy":
+                overlap = "-"
+            else:
+                union = baseline | r["words"]
+                same = len(baseline & r["words"]) / len(union) if union else 1
+                overlap = f"{same:.1%}"
+
+            print(
+                f"{name:<24} {label:<24} {r['median_ms']:>10.2f} "
+                f"{r['p95_ms']:>9.2f} {r['py_peak_kb']:>11.0f} "
+                f"{r['rss_growth_kb']:>9} {overlap:>16}"
+            )
+
+        print()
+
+
+if __name__ == "__main__":
+    main()
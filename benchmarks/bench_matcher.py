@@ -0,0 +1,313 @@
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from matcher import SkillMatcher, term_pattern, prepare
+from rubrics import DEFAULT_ROLES, DEFAULT_BONUS
+
+# filler that contains the short skills as substrings:
+# the legacy loop counts these, the matcher must not
+TRAP_WORDS = [
+    "said", "rapid", "maintain", "email", "paid", "capital", "therapist",
+    "mysql", "nosql", "brag", "drag", "storage", "nodes", "anode",
+    "javascript", "pythonic", "grapi", "said", "again", "detail",
+]
+
+FILLER_WORDS = [
+    "the", "and", "with", "team", "built", "designed", "users", "service",
+    "latency", "improved", "data", "system", "scale", "worked", "led",
+    "customer", "feature", "release", "platform", "tests", "code", "review",
+]
+
+EXTRA_SKILL_WORDS = [
+    "kafka", "rust", "golang", "terraform", "spark", "airflow", "graphql",
+    "grpc", "react", "vue", "svelte", "flask", "celery", "rabbitmq",
+    "elasticsearch", "snowflake", "dbt", "tableau", "jenkins", "ansible",
+]
+
+
+# -----------------------------
+# LEGACY PATH
+# (agent2 before the single-pass matcher:
+#  lowercase + substring scan per role)
+# -----------------------------
+def legacy_score_candidate(cleaned_text, role_data):
+
+    if not cleaned_text:
+        return 0
+
+    text = cleaned_text.lower()
+
+    score = 0
+
+    for skill in role_data["must_have"]:
+        if skill in text:
+            score += 12
+
+    for skill in role_data["good_to_have"]:
+        if skill in text:
+            score += 5
+
+    if "project" in text:
+        score += 8
+
+    if "experience" in text:
+        score += 6
+
+    if "github" in text:
+        score += 4
+
+    if "deployed" in text or "production" in text:
+        score += 6
+
+    max_score = (
+        len(role_data["must_have"]) * 12 +
+        len(role_data["good_to_have"]) * 5 +
+        24
+    )
+
+    return round((score / max_score) * 100, 2)
+
+
+def legacy_score_all(docs, roles):
+    return [
+        {role: legacy_score_candidate(doc, data) for role, data in roles.items()}
+        for doc in docs
+    ]
+
+
+def legacy_word_score_all(docs, roles):
+
+    # the legacy loop with whole-word checks: what fixing it in
+    # place would cost (one search per skill per role)
+    patterns = {}
+
+    def hit(text, skill):
+        if skill not in patterns:
+            patterns[skill] = term_pattern(skill)
+        return skill in text and patterns[skill].search(text) is not None
+
+    scores = []
+
+    for doc in docs:
+
+        row = {}
+
+        for role, data in roles.items():
+
+            text = prepare(doc)
+
+            score = sum(12 for s in data["must_have"] if hit(text, s))
+            score += sum(5 for s in data["good_to_have"] if hit(text, s))
+            score += sum(
+                points for terms, points in DEFAULT_BONUS
+                if any(hit(text, t) for t in terms)
+            )
+
+            max_score = (
+                len(data["must_have"]) * 12 +
+                len(data["good_to_have"]) * 5 +
+                sum(points for _, points in DEFAULT_BONUS)
+            )
+
+            row[role] = round((score / max_score) * 100, 2)
+
+        scores.append(row)
+
+    return scores
+
+
+def matcher_score_all(docs, roles, matcher):
+
+    scores = []
+
+    for doc in docs:
+
+        hits = matcher.present(doc)
+        row = {}
+
+        for role, data in roles.items():
+
+            score = sum(12 for s in data["must_have"] if s in hits)
+            score += sum(5 for s in data["good_to_have"] if s in hits)
+            score += sum(
+                points for terms, points in DEFAULT_BONUS
+                if any(t in hits for t in terms)
+            )
+
+            max_score = (
+                len(data["must_have"]) * 12 +
+                len(data["good_to_have"]) * 5 +
+                sum(points for _, points in DEFAULT_BONUS)
+            )
+
+            row[role] = round((score / max_score) * 100, 2)
+
+        scores.append(row)
+
+    return scores
+
+
+# -----------------------------
+# SYNTHETIC CORPUS
+# -----------------------------
+def make_roles(extra_roles, rng):
+
+    roles = {
+        role: {"must_have": spec["must_have"], "good_to_have": spec["good_to_have"]}
+        for role, spec in DEFAULT_ROLES.items()
+    }
+    pool = EXTRA_SKILL_WORDS + [s for r in roles.values() for v in r.values() for s in v]
+
+    for i in range(extra_roles):
+        picked = rng.sample(pool, 14)
+        roles[f"role_{i}"] = {"must_have": picked[:8], "good_to_have": picked[8:]}
+
+    return roles
+
+
+def make_corpus(n_docs, chars, roles, rng):
+
+    skills = sorted({s for r in roles.values() for v in r.values() for s in v})
+    bonus = [t for terms, _ in DEFAULT_BONUS for t in terms]
+
+    docs = []
+
+    for _ in range(n_docs):
+
+        words = []
+        size = 0
+
+        while size < chars:
+            roll = rng.random()
+
+            if roll < 0.02:
+                word = rng.choice(skills)
+            elif roll < 0.03:
+                word = rng.choice(bonus)
+            elif roll < 0.10:
+                word = rng.choice(TRAP_WORDS)
+            else:
+                word = rng.choice(FILLER_WORDS)
+
+            if rng.random() < 0.1:
+                word = word.capitalize()
+
+            words.append(word)
+            size += len(word) + 1
+
+        docs.append(" ".join(words)[:chars])
+
+    return docs
+
+
+def timed(fn, repeat):
+
+    timings = []
+    result = None
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings), result
+
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description="agent2 skill matching: legacy per-role substring loop "
+                    "vs the shared word-boundary matcher"
+    )
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--chars", type=int, default=30000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--extra-roles", type=int, default=0,
+        help="add N synthetic roles to show how cost grows per role"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    roles = make_roles(args.extra_roles, rng)
+    docs = make_corpus(args.docs, args.chars, roles, rng)
+
+    terms = (
+        [s for r in roles.values() for v in r.values() for s in v] +
+        [t for terms, _ in DEFAULT_BONUS for t in terms]
+    )
+
+    # what agent2 uses, plus both strategies forced
+    matcher = SkillMatcher(terms)
+    per_term = SkillMatcher(terms, single_pass=False)
+    one_pass = SkillMatcher(terms, single_pass=True)
+
+    total_mb = sum(len(d) for d in docs) / 1e6
+
+    print(
+        f"\n📐 {len(docs)} docs x {args.chars} chars ({total_mb:.0f} MB), "
+        f"{len(roles)} roles, {len(matcher.terms)} terms, repeat={args.repeat}, "
+        f"default strategy: {'single pass' if matcher.single_pass else 'find per term'}\n"
+    )
+
+    legacy_s, legacy = timed(lambda: legacy_score_all(docs, roles), args.repeat)
+    legacy_word_s, legacy_word = timed(lambda: legacy_word_score_all(docs, roles), args.repeat)
+    matcher_s, new = timed(lambda: matcher_score_all(docs, roles, matcher), args.repeat)
+    per_term_s, _ = timed(lambda: matcher_score_all(docs, roles, per_term), args.repeat)
+    one_pass_s, _ = timed(lambda: matcher_score_all(docs, roles, one_pass), args.repeat)
+    scan_s, _ = timed(lambda: [matcher.scan(d) for d in docs], args.repeat)
+
+    header = f"{'method':<24} {'seconds':>9} {'docs/s':>10} {'MB/s':>8}"
+    print(header)
+    print("-" * len(header))
+
+    for label, seconds in (
+        ("legacy substring loop", legacy_s),
+        ("legacy + whole words", legacy_word_s),
+        ("shared matcher", matcher_s),
+        ("  find per term", per_term_s),
+        ("  single pass", one_pass_s),
+        ("  + counts/positions", scan_s),
+    ):
+        print(
+            f"{label:<24} {seconds:>9.3f} {len(docs) / seconds:>10.0f} "
+            f"{total_mb / seconds:>8.1f}"
+        )
+
+    print(
+        f"\n⚡ speedup: {legacy_s / matcher_s:.1f}x over the substring loop, "
+        f"{legacy_word_s / matcher_s:.1f}x over it with whole-word checks"
+    )
+
+    assert legacy_word == new, "whole-word legacy loop and matcher disagree"
+
+    # where the two disagree, the legacy loop matched inside words
+    inflated = sum(
+        1 for old, cur in zip(legacy, new)
+        for role in roles if old[role] > cur[role]
+    )
+    pairs = len(docs) * len(roles)
+
+    print(
+        f"🎯 scores inflated by substring hits in the legacy loop: "
+        f"{inflated}/{pairs} ({inflated / pairs:.1%})"
+    )
+
+    sample = matcher.scan(docs[0])
+    print(
+        "🔍 first doc, hit counts: "
+        + ", ".join(f"{t}={len(p)}" for t, p in sorted(sample.items())[:8])
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,651 @@
+import os
+import re
+import json
+import math
+import time
+import shutil
+import asyncio
+import argparse
+from collections import Counter
+from contextlib import contextmanager
+import asyncpg
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no cross-process lock: run one writer at a time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+DB_CONFIG = {
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "database": os.getenv("DB_NAME"),
+    "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT"),
+}
+
+# -----------------------------
+# BM25 INDEX OVER cleaned_data
+# an on-disk inverted index made of immutable
+# segments (plain .npy arrays, memory-mapped on
+# load). new or changed portfolios go into a new
+# segment; the newest segment holding a portfolio
+# wins. segments of similar size are merged in
+# tiers (MERGE_FACTOR at a time), so a document
+# is rewritten about log(N) times, not per add
+# -----------------------------
+INDEX_DIR = os.getenv("BM25_INDEX_DIR", "bm25_index")
+
+K1 = 1.2
+B = 0.75
+
+MAX_TERM = 32
+
+# MERGE_FACTOR adjacent segments in the same size tier merge into one;
+# tiers start at TIER_FLOOR docs (smaller segments all count as tier 0)
+MERGE_FACTOR = 8
+TIER_FLOOR = 64
+
+# portfolios fetched from the database at once when syncing
+SYNC_BATCH = 500
+
+# a removed portfolio: hides older copies, matches nothing
+TOMBSTONE = ""
+
+SEGMENT_FILES = ("pids", "hashes", "lengths", "terms", "offsets", "post_doc", "post_tf")
+
+TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from has have i in is it its my of on
+    or our so that the their this to was we were will with you your
+""".split())
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM]
+        for token in TOKEN.findall((text or "").lower())
+        if token not in STOPWORDS
+    ]
+
+
+def require_numpy(index="the BM25 index"):
+    if np is None:
+        raise RuntimeError(f"{index} needs numpy (pip install numpy)")
+
+
+def load_array(file):
+    try:
+        return np.load(file, mmap_mode="r")
+    except ValueError:
+        return np.load(file)  # empty arrays cannot be mapped
+
+
+# -----------------------------
+# SEGMENTS
+# per segment: portfolio ids, content hashes and
+# token counts per doc, a sorted term array with
+# posting offsets, and (doc, tf) postings grouped
+# by term
+# -----------------------------
+def save_segment(path, arrays):
+
+    # written aside and renamed: a reader never sees half a segment
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for name in SEGMENT_FILES:
+        np.save(os.path.join(tmp, name + ".npy"), arrays[name])
+
+    os.rename(tmp, path)
+
+
+def postings_arrays(post_term, post_doc, post_tf, n_terms):
+
+    # group postings by term (doc order inside a term)
+    order = np.lexsort((post_doc, post_term))
+
+    offsets = np.zeros(n_terms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(post_term, minlength=n_terms), out=offsets[1:])
+
+    return offsets, post_doc[order].astype(np.int32), post_tf[order].astype(np.int32)
+
+
+def write_segment(path, docs):
+
+    # docs: [(portfolio id, content hash, text)]
+    counts = [Counter(tokenize(text)) for _, _, text in docs]
+
+    vocab = sorted({term for c in counts for term in c})
+    term_id = {term: i for i, term in enumerate(vocab)}
+
+    n_postings = sum(len(c) for c in counts)
+    post_term = np.empty(n_postings, dtype=np.int32)
+    post_doc = np.empty(n_postings, dtype=np.int32)
+    post_tf = np.empty(n_postings, dtype=np.int32)
+
+    i = 0
+
+    for d, c in enumerate(counts):
+        k = len(c)
+        post_term[i:i + k] = [term_id[term] for term in c]
+        post_doc[i:i + k] = d
+        post_tf[i:i + k] = list(c.values())
+        i += k
+
+    offsets, post_doc, post_tf = postings_arrays(post_term, post_doc, post_tf, len(vocab))
+
+    save_segment(path, {
+        "pids": np.array([pid for pid, _, _ in docs], dtype=np.int64),
+        "hashes": np.array([h for _, h, _ in docs], dtype="<U64"),
+        "lengths": np.array([sum(c.values()) for c in counts], dtype=np.int32),
+        "terms": np.array(vocab, dtype=f"<U{MAX_TERM}"),
+        "offsets": offsets,
+        "post_doc": post_doc,
+        "post_tf": post_tf,
+    })
+
+
+class Segment:
+
+    def __init__(self, path):
+
+        for name in SEGMENT_FILES:
+            setattr(self, name, load_array(os.path.join(path, name + ".npy")))
+
+        # doc -> position in the index, -1 when superseded (BM25Index)
+        self.global_ids = None
+
+    def postings(self, term):
+
+        i = int(np.searchsorted(self.terms, term))
+
+        if i == len(self.terms) or self.terms[i] != term:
+            return None
+
+        start, end = self.offsets[i], self.offsets[i + 1]
+
+        return self.post_doc[start:end], self.post_tf[start:end]
+
+
+# -----------------------------
+# MANIFEST + LOCK
+# (shared with the embedding index)
+# -----------------------------
+def read_manifest(path, empty=None):
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return empty or {"segments": [], "next": 0}
+
+
+def write_manifest(path, manifest):
+    tmp = os.path.join(path, "manifest.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, "manifest.json"))
+
+
+@contextmanager
+def locked(path):
+
+    # one writer at a time across agent1 workers / agent2 / the CLI
+    os.makedirs(path, exist_ok=True)
+
+    with open(os.path.join(path, ".lock"), "w") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+# -----------------------------
+# READER
+# -----------------------------
+class BM25Index:
+
+    def __init__(self, path=INDEX_DIR, k1=K1, b=B):
+
+        require_numpy()
+
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        # a merge may remove segments between reading the
+        # manifest and opening them: read it again
+        for attempt in range(3):
+            try:
+                self.manifest = read_manifest(path)
+                self.segments = [
+                    Segment(os.path.join(path, name))
+                    for name in self.manifest["segments"]
+                ]
+                break
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                time.sleep(0.05)
+
+        # newest segment first: a portfolio's latest copy is live
+        seen = np.empty(0, dtype=np.int64)
+        pids, hashes, lengths = [], [], []
+        total = 0
+
+        for seg in reversed(self.segments):
+
+            newest = ~np.isin(seg.pids, seen)
+            seen = np.concatenate([seen, seg.pids[newest]])
+
+            live = newest & (seg.hashes != TOMBSTONE)
+
+            # latest copy of a portfolio, tombstones included (merges)
+            seg.newest = newest
+
+            seg.global_ids = np.full(len(seg.pids), -1, dtype=np.int64)
+            seg.global_ids[live] = np.arange(total, total + live.sum())
+            total += int(live.sum())
+
+            pids.append(seg.pids[live])
+            hashes.append(seg.hashes[live])
+            lengths.append(seg.lengths[live])
+
+        self.pids = np.concatenate(pids) if pids else np.empty(0, dtype=np.int64)
+        self.hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype="<U64")
+        self.lengths = (
+            np.concatenate(lengths).astype(float) if lengths else np.empty(0)
+        )
+
+        avgdl = self.lengths.mean() if total else 1.0
+
+        # length normalization per doc, the same for every query
+        self.norm = k1 * (1 - b + b * self.lengths / max(avgdl, 1.0))
+
+    def __len__(self):
+        return len(self.pids)
+
+    def live_hashes(self):
+        return dict(zip(self.pids.tolist(), self.hashes.tolist()))
+
+    def idf(self, df):
+        n = len(self.pids)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score_all(self, text):
+
+        # (score per live doc, best score the query can reach);
+        # the ceiling is every query term with unbounded tf
+        scores = np.zeros(len(self.pids))
+        ceiling = 0.0
+
+        if not len(self.pids):
+            return scores, ceiling
+
+        for term, qtf in Counter(tokenize(text)).items():
+
+            hits = []
+
+            for seg in self.segments:
+
+                found = seg.postings(term)
+
+                if found is None:
+                    continue
+
+                docs, tfs = found
+                ids = seg.global_ids[docs]
+                live = ids >= 0
+                hits.append((ids[live], tfs[live]))
+
+            df = sum(len(ids) for ids, _ in hits)
+
+            if not df:
+                continue
+
+            weight = qtf * self.idf(df)
+            ceiling += weight * (self.k1 + 1)
+
+            # a live doc sits in exactly one segment: no duplicate ids
+            for ids, tfs in hits:
+                tf = tfs.astype(float)
+                scores[ids] += weight * tf * (self.k1 + 1) / (tf + self.norm[ids])
+
+        return scores, ceiling
+
+    def top_k(self, text, k=10):
+
+        # [(portfolio id, bm25 score)], best first, matches only
+        scores, _ = self.score_all(text)
+
+        k = min(k, len(scores))
+
+        if k <= 0:
+            return []
+
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        return [
+            (int(self.pids[i]), float(scores[i]))
+            for i in best
+            if scores[i] > 0
+        ]
+
+
+# -----------------------------
+# WRITER
+# -----------------------------
+def new_segment(path, docs):
+
+    # caller holds the lock
+    manifest = read_manifest(path)
+    name = f"seg_{manifest['next']:06d}"
+
+    write_segment(os.path.join(path, name), docs)
+
+    manifest["segments"].append(name)
+    manifest["next"] += 1
+    write_manifest(path, manifest)
+
+    merge_tiers(path)
+
+
+def add_documents(path, docs):
+
+    # docs: [(portfolio id, content hash, text)]; portfolios
+    # already indexed with the same hash are skipped
+    require_numpy()
+
+    with locked(path):
+
+        known = BM25Index(path).live_hashes()
+
+        fresh = {
+            pid: (pid, h, text)
+            for pid, h, text in docs
+            if known.get(pid) != h
+        }
+
+        if fresh:
+            new_segment(path, list(fresh.values()))
+
+    return len(fresh)
+
+
+def remove_documents(path, pids):
+
+    require_numpy()
+
+    with locked(path):
+
+        known = BM25Index(path).live_hashes()
+        gone = [(pid, TOMBSTONE, None) for pid in set(pids) if pid in known]
+
+        if gone:
+            new_segment(path, gone)
+
+    return len(gone)
+
+
+def tier(docs):
+    return int(math.log(max(docs, TIER_FLOOR) / TIER_FLOOR, MERGE_FACTOR))
+
+
+def merge_run(path):
+
+    # first MERGE_FACTOR adjacent segments of one tier, or None;
+    # sizes come from the pids headers, nothing else is read
+    names = read_manifest(path)["segments"]
+
+    tiers = [
+        tier(len(load_array(os.path.join(path, name, "pids.npy"))))
+        for name in names
+    ]
+
+    for start in range(len(tiers) - MERGE_FACTOR + 1):
+        if len(set(tiers[start:start + MERGE_FACTOR])) == 1:
+            return start, start + MERGE_FACTOR
+
+    return None
+
+
+def merge_tiers(path):
+
+    # merge, then look again: the result may complete
+    # the next tier up; caller holds the lock
+    run = merge_run(path)
+
+    while run:
+        merge_segments(path, None, *run)
+        run = merge_run(path)
+
+
+def merge_segments(path, index=None, start=0, end=None):
+
+    # the live docs of segments [start, end) into one segment
+    # in their place, straight from the postings (no
+    # re-tokenizing); all segments when no range is given.
+    # caller holds the lock
+    if index is None:
+        index = BM25Index(path)
+
+    old = list(index.manifest["segments"])
+    end = len(old) if end is None else end
+
+    run = index.segments[start:end]
+
+    if not run:
+        return
+
+    # superseded copies are dropped; a tombstone is kept
+    # while older segments may still hold the portfolio
+    keep_tombstones = start > 0
+
+    keeps, local_ids = [], []
+    total = 0
+
+    for seg in run:
+
+        keep = seg.global_ids >= 0
+        if keep_tombstones:
+            keep |= seg.newest & (seg.hashes == TOMBSTONE)
+
+        ids = np.full(len(seg.pids), -1, dtype=np.int64)
+        ids[keep] = np.arange(total, total + keep.sum())
+        total += int(keep.sum())
+
+        keeps.append(keep)
+        local_ids.append(ids)
+
+    vocab = np.unique(np.concatenate([seg.terms for seg in run]))
+
+    terms, docs, tfs = [], [], []
+
+    for seg, ids in zip(run, local_ids):
+
+        per_term = np.diff(seg.offsets)
+        term_ids = np.repeat(np.searchsorted(vocab, seg.terms), per_term)
+
+        doc_ids = ids[seg.post_doc]
+        live = doc_ids >= 0
+
+        terms.append(term_ids[live])
+        docs.append(doc_ids[live])
+        tfs.append(np.asarray(seg.post_tf)[live])
+
+    # drop terms only superseded docs used
+    post_term = np.concatenate(terms)
+    used = np.unique(post_term)
+    post_term = np.searchsorted(used, post_term)
+
+    offsets, post_doc, post_tf = postings_arrays(
+        post_term,
+        np.concatenate(docs),
+        np.concatenate(tfs),
+        len(used)
+    )
+
+    manifest = read_manifest(path)
+    name = f"seg_{manifest['next']:06d}"
+
+    save_segment(os.path.join(path, name), {
+        "pids": np.concatenate([seg.pids[k] for seg, k in zip(run, keeps)]),
+        "hashes": np.concatenate([seg.hashes[k] for seg, k in zip(run, keeps)]),
+        "lengths": np.concatenate([seg.lengths[k] for seg, k in zip(run, keeps)]).astype(np.int32),
+        "terms": vocab[used],
+        "offsets": offsets,
+        "post_doc": post_doc,
+        "post_tf": post_tf,
+    })
+
+    write_manifest(path, {
+        "segments": old[:start] + [name] + old[end:],
+        "next": manifest["next"] + 1,
+    })
+
+    for stale in old[start:end]:
+        shutil.rmtree(os.path.join(path, stale), ignore_errors=True)
+
+
+def clear_index(path):
+    with locked(path):
+        for name in read_manifest(path)["segments"]:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        write_manifest(path, {"segments": [], "next": 0})
+
+
+# -----------------------------
+# DATABASE SYNC
+# catches up with whatever agent1 did not feed
+# (runs before agent2 --bm25, or from the CLI)
+# -----------------------------
+async def fetch_content_hashes(conn):
+
+    # {portfolio id: content hash} of completed portfolios; hashes
+    # only, texts are fetched for changed portfolios alone
+    rows = await conn.fetch("""
+        SELECT id,
+               COALESCE(
+                   content_hash,
+                   encode(sha256(convert_to(COALESCE(cleaned_data, ''), 'UTF8')), 'hex')
+               ) AS content_hash
+        FROM portfolios
+        WHERE status='completed'
+        ORDER BY id;
+    """)
+
+    return {r["id"]: r["content_hash"] for r in rows}
+
+
+async def sync_index(conn, path=INDEX_DIR, rebuild=False):
+
+    require_numpy()
+
+    if rebuild:
+        clear_index(path)
+
+    known = BM25Index(path).live_hashes()
+    current = await fetch_content_hashes(conn)
+
+    stale = [pid for pid, h in current.items() if known.get(pid) != h]
+    gone = [pid for pid in known if pid not in current]
+
+    added = 0
+
+    for start in range(0, len(stale), SYNC_BATCH):
+
+        batch = await conn.fetch("""
+            SELECT id, cleaned_data
+            FROM portfolios
+            WHERE id = ANY($1::int[]);
+        """, stale[start:start + SYNC_BATCH])
+
+        added += await asyncio.to_thread(
+            add_documents,
+            path,
+            [(r["id"], current[r["id"]], r["cleaned_data"]) for r in batch]
+        )
+
+    removed = await asyncio.to_thread(remove_documents, path, gone) if gone else 0
+
+    if rebuild:
+        with locked(path):
+            merge_segments(path)
+
+    return added, removed
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+async def main():
+
+    parser = argparse.ArgumentParser(description="BM25 index over scraped portfolios")
+    parser.add_argument("--index", default=INDEX_DIR, metavar="DIR")
+    parser.add_argument("--sync", action="store_true", help="index new/changed portfolios")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild from scratch")
+    parser.add_argument("--merge", action="store_true", help="merge every segment into one")
+    parser.add_argument("--query", help="job description text to rank against")
+    parser.add_argument("--query-file", help="read the job description from a file")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+
+    try:
+        if args.sync or args.rebuild:
+            added, removed = await sync_index(conn, args.index, rebuild=args.rebuild)
+            print(f"📚 BM25 index: {added} added/updated, {removed} removed")
+
+        if args.merge:
+            with locked(args.index):
+                merge_segments(args.index)
+            print("🗜️ BM25 index merged into one segment")
+
+        query = args.query
+
+        if args.query_file:
+            with open(args.query_file, encoding="utf-8") as f:
+                query = f.read()
+
+        if not query:
+            return
+
+        started = time.perf_counter()
+        index = BM25Index(args.index)
+        loaded_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        top = index.top_k(query, args.top)
+        took_ms = (time.perf_counter() - started) * 1000
+
+        names = {
+            r["id"]: r["candidate_name"]
+            for r in await conn.fetch("""
+                SELECT id, candidate_name FROM portfolios WHERE id = ANY($1::int[]);
+            """, [pid for pid, _ in top])
+        }
+
+    finally:
+        await conn.close()
+
+    print(
+        f"\n🔎 top {len(top)} of {len(index)} portfolios "
+        f"(load {loaded_ms:.1f} ms, query {took_ms:.1f} ms)\n"
+    )
+
+    for i, (pid, score) in enumerate(top, start=1):
+        print(f"{i}. {names.get(pid, pid)} → {score:.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
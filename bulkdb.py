@@ -0,0 +1,91 @@
+import itertools
+
+# -----------------------------
+# BULK WRITE-BACK
+# rows are COPYed into a temp table and applied
+# with ONE UPDATE ... FROM: a fixed number of round
+# trips however many rows are written
+# -----------------------------
+_names = itertools.count()
+
+
+async def _stage(conn, table, fields, rows):
+
+    staging = f"_bulk_{table}_{next(_names)}"
+
+    # same column types as the target, without its constraints
+    await conn.execute(f"""
+        CREATE TEMP TABLE {staging}
+        ON COMMIT DROP
+        AS SELECT {", ".join(fields)}
+        FROM {table}
+        WITH NO DATA;
+    """)
+
+    await conn.copy_records_to_table(
+        staging,
+        records=rows,
+        columns=fields
+    )
+
+    return staging
+
+
+async def bulk_update(conn, table, key, columns, rows, set_extra=None, where=None):
+
+    # rows: [(key, value per column), ...]
+    # set_extra: {column: sql expression} applied to every updated row
+    # where: extra sql condition on the target row (alias t)
+    if not rows:
+        return 0
+
+    fields = [key] + list(columns)
+
+    assignments = [f"{c} = s.{c}" for c in columns]
+    assignments += [f"{c} = {expr}" for c, expr in (set_extra or {}).items()]
+
+    condition = f"t.{key} = s.{key}"
+
+    if where:
+        condition += f" AND ({where})"
+
+    async with conn.transaction():
+
+        staging = await _stage(conn, table, fields, rows)
+
+        result = await conn.execute(f"""
+            UPDATE {table} t
+            SET {", ".join(assignments)}
+            FROM {staging} s
+            WHERE {condition};
+        """)
+
+    return int(result.split()[-1])
+
+
+async def bulk_upsert(conn, table, keys, columns, rows, set_extra=None):
+
+    # rows: [(key values..., value per column), ...]
+    # keys: the conflict target (primary key or unique columns)
+    # set_extra: {column: sql expression} on inserted and updated rows
+    if not rows:
+        return 0
+
+    fields = list(keys) + list(columns)
+    extra = set_extra or {}
+
+    assignments = [f"{c} = EXCLUDED.{c}" for c in list(columns) + list(extra)]
+
+    async with conn.transaction():
+
+        staging = await _stage(conn, table, fields, rows)
+
+        result = await conn.execute(f"""
+            INSERT INTO {table} ({", ".join(fields + list(extra))})
+            SELECT {", ".join(fields + list(extra.values()))}
+            FROM {staging}
+            ON CONFLICT ({", ".join(keys)})
+            DO UPDATE SET {", ".join(assignments)};
+        """)
+
+    return int(result.split()[-1])
@@ -1,9 +1,11 @@
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import asyncpg
 import os
+import time
 from dotenv import load_dotenv
+from search import search_portfolios, QUERY_PARSERS, DEFAULT_LIMIT
 
 load_dotenv()
 
@@ -101,6 +103,37 @@ async def dashboard(request: Request):
         {"request": request, "candidates": candidates}
     )
 
+############################################
+# SKILL SEARCH API
+############################################
+
+@app.get("/search")
+async def search(q: str, limit: int = DEFAULT_LIMIT, offset: int = 0, mode: str = "websearch"):
+    """
+    Ranked full-text search over scraped portfolios, e.g.
+    /search?q=kafka rust  or  /search?q="machine learning" -php
+    """
+    if mode not in QUERY_PARSERS:
+        raise HTTPException(400, f"mode must be one of {sorted(QUERY_PARSERS)}")
+
+    if offset < 0:
+        raise HTTPException(400, "offset must be >= 0")
+
+    started = time.perf_counter()
+
+    try:
+        async with app.state.pool.acquire() as conn:
+            rows = await search_portfolios(conn, q, limit, offset, mode)
+    except asyncpg.PostgresSyntaxError as e:
+        raise HTTPException(400, f"bad query: {e}")
+
+    return {
+        "query": q,
+        "mode": mode,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        "results": [dict(r) for r in rows],
+    }
+
 ############################################
 # WEBSOCKET ENDPOINT
 ############################################
@@ -1,7 +1,11 @@
 import os
+import sys
+import json
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from rubrics import DEFAULT_ROLES
+from search import SEARCH_CONFIG
 
 load_dotenv()
 
@@ -89,11 +93,35 @@ def create_tables():
 
             shortlist_status TEXT,
 
+            content_hash TEXT,
+            content_updated_at TIMESTAMP,
+            scored_at TIMESTAMP,
+
+            claimed_by TEXT,
+            claimed_at TIMESTAMP,
+            lease_expires_at TIMESTAMP,
+            attempts INTEGER NOT NULL DEFAULT 0,
+
             last_scraped TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
     """)
 
+    ############################################
+    # SCHEMA UPGRADES (existing databases)
+    ############################################
+
+    cursor.execute("""
+        ALTER TABLE portfolios
+            ADD COLUMN IF NOT EXISTS content_hash TEXT,
+            ADD COLUMN IF NOT EXISTS content_updated_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS scored_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+            ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+    """)
+
     ############################################
     # INDEXES for performance
     ############################################
@@ -103,6 +131,13 @@ def create_tables():
         ON portfolios(status);
     """)
 
+    # reaper scan: only rows currently claimed
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_portfolios_lease
+        ON portfolios(lease_expires_at)
+        WHERE status = 'processing';
+    """)
+
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_portfolios_backend_score
         ON portfolios(backend_score DESC);
@@ -113,6 +148,173 @@ def create_tables():
         ON portfolios(final_backend_score DESC);
     """)
 
+    ##################################################
+    # full-text search (search.py, dashboard /search)
+    # kept current by Postgres on every write of the
+    # text; adding it to an existing table rewrites
+    # the table once
+    ##################################################
+
+    cursor.execute(f"""
+        ALTER TABLE portfolios
+            ADD COLUMN IF NOT EXISTS search_tsv tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(candidate_name, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}', COALESCE(cleaned_data, '')), 'D')
+            ) STORED;
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_portfolios_search
+        ON portfolios USING GIN (search_tsv);
+    """)
+
+    ##################################################
+    # pending notifications (agent1 --daemon)
+    # fires on insert and on requeue to 'pending';
+    # delivered when the writing transaction commits
+    ##################################################
+
+    cursor.execute("""
+        CREATE OR REPLACE FUNCTION notify_portfolio_pending()
+        RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('portfolio_pending', NEW.id::text);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    cursor.execute("""
+        DROP TRIGGER IF EXISTS trg_portfolio_pending ON portfolios;
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER trg_portfolio_pending
+        AFTER INSERT OR UPDATE OF status ON portfolios
+        FOR EACH ROW
+        WHEN (NEW.status = 'pending')
+        EXECUTE FUNCTION notify_portfolio_pending();
+    """)
+
+    ##################################################
+    # crawl_pages table (conditional re-crawl cache)
+    ##################################################
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_pages (
+            portfolio_id INTEGER NOT NULL
+                REFERENCES portfolios(id)
+                ON DELETE CASCADE,
+            url TEXT NOT NULL,
+            rank INTEGER,
+
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            cleaned_text TEXT,
+            tier VARCHAR(10),
+            html_hash TEXT,
+
+            fetched_at TIMESTAMP,
+            checked_at TIMESTAMP,
+
+            PRIMARY KEY (portfolio_id, url)
+        );
+    """)
+
+    cursor.execute("""
+        ALTER TABLE crawl_pages
+            ADD COLUMN IF NOT EXISTS html_hash TEXT;
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_crawl_pages_html_hash
+        ON crawl_pages(html_hash);
+    """)
+
+    ##################################################
+    # html_snapshots table
+    # rendered HTML per page, compressed and
+    # deduplicated by sha256 (agent1 --reextract)
+    ##################################################
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS html_snapshots (
+            hash TEXT PRIMARY KEY,
+            codec VARCHAR(10) NOT NULL,
+            raw_size INTEGER,
+            data BYTEA NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    ##################################################
+    # roles table (agent2 scoring rubrics)
+    # edit a row and the next agent2 run rescores that
+    # role only; insert one and it is backfilled
+    ##################################################
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS roles (
+            name TEXT PRIMARY KEY,
+            must_have TEXT[] NOT NULL DEFAULT '{}',
+            good_to_have TEXT[] NOT NULL DEFAULT '{}',
+            must_weight INTEGER NOT NULL DEFAULT 12,
+            good_weight INTEGER NOT NULL DEFAULT 5,
+            bonus JSONB NOT NULL DEFAULT '[]',
+            jd TEXT,
+            active BOOLEAN NOT NULL DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    # job description per role (agent2 --bm25)
+    cursor.execute("""
+        ALTER TABLE roles
+            ADD COLUMN IF NOT EXISTS jd TEXT;
+    """)
+
+    for name, spec in DEFAULT_ROLES.items():
+        cursor.execute("""
+            INSERT INTO roles (name, must_have, good_to_have, must_weight, good_weight, bonus)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (name) DO NOTHING;
+        """, (
+            name,
+            spec["must_have"],
+            spec["good_to_have"],
+            spec["must_weight"],
+            spec["good_weight"],
+            json.dumps(spec["bonus"]),
+        ))
+
+    ##################################################
+    # role_scores table
+    # one rule-based score per portfolio and role, with
+    # the content hash + rubric version it came from
+    ##################################################
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS role_scores (
+            portfolio_id INTEGER NOT NULL
+                REFERENCES portfolios(id)
+                ON DELETE CASCADE,
+            role TEXT NOT NULL,
+            score FLOAT,
+            scored_hash TEXT,
+            rubric_version TEXT,
+            scored_at TIMESTAMP,
+
+            PRIMARY KEY (portfolio_id, role)
+        );
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_role_scores_role_score
+        ON role_scores(role, score DESC);
+    """)
+
     ##################################################
     # hr_questions table
     ##################################################
@@ -215,6 +417,13 @@ def insert_sample_data():
 
 if __name__ == "__main__":
 
+    # --migrate: upgrade an existing database in place (no reset, no samples)
+    if "--migrate" in sys.argv:
+        print("\n🔧 Migrating Hiring Agent Database...\n")
+        create_tables()
+        print("\n🎉 Database schema up to date!\n")
+        sys.exit(0)
+
     print("\n🚀 Resetting Hiring Agent Database...\n")
 
     reset_database()
@@ -0,0 +1,649 @@
+import os
+import re
+import math
+import time
+import zlib
+import shutil
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, defaultdict
+import asyncpg
+from dotenv import load_dotenv
+from bm25 import (
+    tokenize, locked, fetch_content_hashes,
+    read_manifest, write_manifest, load_array, require_numpy
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+DB_CONFIG = {
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "database": os.getenv("DB_NAME"),
+    "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT"),
+}
+
+# -----------------------------
+# LOCAL EMBEDDINGS
+# CPU only, nothing leaves the machine: hashed
+# tf-idf over words + word pairs, reduced to DIMS
+# dimensions by a truncated SVD fitted on the
+# portfolios themselves (latent semantic analysis),
+# so terms that co-occur across portfolios land
+# close together. vectors are float32 .npy files,
+# searched through an IVF index (k-means lists)
+# -----------------------------
+INDEX_DIR = os.getenv("EMBED_INDEX_DIR", "embed_index")
+
+HASH_FEATURES = 2 ** 16
+DIMS = 128
+
+# randomized SVD: extra directions + power iterations
+OVERSAMPLE = 10
+POWER_ITERS = 1
+
+# portfolios the SVD is fitted on; refit once the corpus doubles
+FIT_SAMPLE = 5000
+REFIT_GROWTH = 2.0
+
+# IVF: about sqrt(N) lists, NPROBE of them scanned per query
+KMEANS_ITERS = 10
+KMEANS_SAMPLE = 50000
+NPROBE = 8
+
+SYNC_BATCH = 500
+SEED = 7
+
+# embedding is CPU-bound: big syncs fan out
+PARALLEL_MIN_TEXTS = 2000
+
+# spellings of the same thing, folded before hashing:
+# "built RAG systems" and "retrieval-augmented generation" share a feature
+ALIASES = [
+    (r"retrieval[\s\-]+augmented[\s\-]+generation", "rag"),
+    (r"large[\s\-]+language[\s\-]+models?|llms", "llm"),
+    (r"natural[\s\-]+language[\s\-]+processing", "nlp"),
+    (r"generative[\s\-]+ai|gen[\s\-]+ai", "genai"),
+    (r"vector[\s\-]+(?:db|dbs|store|stores|databases)", "vector database"),
+    (r"\bml\b", "machine learning"),
+    (r"\bdl\b", "deep learning"),
+    (r"\bk8s\b", "kubernetes"),
+    (r"postgresql", "postgres"),
+    (r"node[\s.]?js", "node"),
+    (r"\bjs\b", "javascript"),
+    (r"\bts\b", "typescript"),
+    (r"\bgolang\b", "go"),
+]
+
+ALIAS_PATTERNS = [(re.compile(pattern), canonical) for pattern, canonical in ALIASES]
+
+# token -> hashed column; portfolios share most of their vocabulary
+_feature_ids = {}
+FEATURE_CACHE = 1_000_000
+
+
+# -----------------------------
+# FEATURES
+# -----------------------------
+def canonical(text):
+
+    # one sub per alias: each pattern starts with a literal, which
+    # re scans for much faster than a single alternation
+    text = (text or "").lower()
+
+    for pattern, replacement in ALIAS_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    return text
+
+
+def feature_id(key):
+
+    i = _feature_ids.get(key)
+
+    if i is None:
+        # crc32, not hash(): the same column in every process
+        i = zlib.crc32(key.encode("utf-8")) % HASH_FEATURES
+        if len(_feature_ids) < FEATURE_CACHE:
+            _feature_ids[key] = i
+
+    return i
+
+
+def features(text):
+
+    # (hashed columns, sublinear tf) of words and adjacent word pairs
+    tokens = tokenize(canonical(text))
+
+    counts = Counter(tokens)
+    counts.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    hashed = defaultdict(float)
+
+    for key, count in counts.items():
+        hashed[feature_id(key)] += count
+
+    columns = np.fromiter(hashed.keys(), dtype=np.int64, count=len(hashed))
+    tf = np.fromiter(hashed.values(), dtype=float, count=len(hashed))
+
+    return columns, 1 + np.log(tf)
+
+
+def weighted(columns, tf, idf):
+
+    # l2-normalized tf-idf row
+    w = tf * idf[columns]
+    norm = np.linalg.norm(w)
+
+    return w / norm if norm else w
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+# -----------------------------
+# MODEL (idf + SVD projection)
+# randomized range finder over the sparse rows:
+# only products with the tf-idf matrix are needed,
+# so it is never materialized
+# -----------------------------
+
+# non-zeros per product chunk (memory: CHUNK_NNZ x (DIMS + OVERSAMPLE) floats)
+CHUNK_NNZ = 200_000
+
+
+class SparseRows:
+
+    # the tf-idf rows as flat arrays, in row order (X @ m)
+    # and in column order (X.T @ q); numpy has no sparse type
+
+    def __init__(self, rows):
+
+        lengths = np.array([len(columns) for columns, _ in rows], dtype=np.int64)
+
+        self.n = len(rows)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.indices = np.concatenate([c for c, _ in rows]) if rows else np.empty(0, np.int64)
+        self.data = (
+            np.concatenate([w for _, w in rows]).astype(np.float32)
+            if rows else np.empty(0, np.float32)
+        )
+        self.nonempty = np.flatnonzero(lengths)
+
+        order = np.argsort(self.indices, kind="stable")
+        self.t_rows = np.repeat(np.arange(self.n), lengths)[order]
+        self.t_data = self.data[order]
+        self.t_cols, self.t_starts = np.unique(self.indices[order], return_index=True)
+
+    def dot(self, m):
+
+        out = np.zeros((self.n, m.shape[1]), dtype=np.float32)
+        rows = self.nonempty
+
+        i = 0
+        while i < len(rows):
+
+            # whole rows per chunk, about CHUNK_NNZ non-zeros
+            a = self.indptr[rows[i]]
+            j = max(i + 1, int(np.searchsorted(self.indptr[rows + 1], a + CHUNK_NNZ)))
+            j = min(j, len(rows))
+            b = self.indptr[rows[j - 1] + 1]
+
+            products = m[self.indices[a:b]] * self.data[a:b, None]
+            out[rows[i:j]] = np.add.reduceat(products, self.indptr[rows[i:j]] - a)
+
+            i = j
+
+        return out
+
+    def tdot(self, q):
+
+        out = np.zeros((HASH_FEATURES, q.shape[1]), dtype=np.float32)
+        ends = np.append(self.t_starts[1:], len(self.t_data))
+
+        i = 0
+        while i < len(self.t_cols):
+
+            # whole columns per chunk
+            a = self.t_starts[i]
+            j = max(i + 1, int(np.searchsorted(ends, a + CHUNK_NNZ)))
+            j = min(j, len(self.t_cols))
+            b = ends[j - 1]
+
+            products = q[self.t_rows[a:b]] * self.t_data[a:b, None]
+            out[self.t_cols[i:j]] = np.add.reduceat(products, self.t_starts[i:j] - a)
+
+            i = j
+
+        return out
+
+
+def fit_model(texts, dims=DIMS, seed=SEED):
+
+    require_numpy("the embedding index")
+
+    rows = [features(text) for text in texts]
+    n = len(rows)
+
+    df = np.zeros(HASH_FEATURES)
+    for columns, _ in rows:
+        df[columns] += 1
+
+    idf = np.log((1 + n) / (1 + df)) + 1
+
+    x = SparseRows([(columns, weighted(columns, tf, idf)) for columns, tf in rows])
+
+    k = max(1, min(dims + OVERSAMPLE, n))
+    dims = min(dims, k)
+
+    rng = np.random.default_rng(seed)
+    y = x.dot(rng.standard_normal((HASH_FEATURES, k)).astype(np.float32))
+
+    for _ in range(POWER_ITERS):
+        q, _ = np.linalg.qr(y)
+        z, _ = np.linalg.qr(x.tdot(q))
+        y = x.dot(z.astype(np.float32))
+
+    q, _ = np.linalg.qr(y)
+    _, _, vt = np.linalg.svd(x.tdot(q).T, full_matrices=False)
+
+    return {
+        "idf": idf.astype(np.float32),
+        "projection": vt[:dims].T.astype(np.float32),
+        "fitted_on": np.array(n),
+    }
+
+
+def embed(model, texts):
+
+    # (len(texts) x dims) float32, unit length (cosine = dot product)
+    out = np.zeros((len(texts), model["projection"].shape[1]), dtype=np.float32)
+
+    for i, text in enumerate(texts):
+        columns, tf = features(text)
+        if len(columns):
+            out[i] = weighted(columns, tf, model["idf"]) @ model["projection"][columns]
+
+    return normalize_rows(out).astype(np.float32)
+
+
+# spawned workers load the model once
+_worker_model = None
+
+
+def _init_worker(model):
+    global _worker_model
+    _worker_model = model
+
+
+def _embed_chunk(texts):
+    return embed(_worker_model, texts)
+
+
+class Embedder:
+
+    # embeds sync batches in this process, or in a spawn
+    # pool when there are enough texts and CPUs for it
+
+    def __init__(self, model, total):
+        self.model = model
+        self.executor = None
+
+        processes = os.cpu_count() or 1
+
+        if total >= PARALLEL_MIN_TEXTS and processes > 1:
+            self.executor = ProcessPoolExecutor(
+                processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model,)
+            )
+
+    def embed(self, texts):
+
+        if not self.executor:
+            return embed(self.model, texts)
+
+        step = max(1, len(texts) // (self.executor._max_workers * 4))
+        chunks = [texts[i:i + step] for i in range(0, len(texts), step)]
+
+        return np.concatenate(list(self.executor.map(_embed_chunk, chunks)))
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+
+
+# -----------------------------
+# IVF (inverted file) INDEX
+# spherical k-means centroids; a query scans only
+# the lists of its NPROBE closest centroids
+# -----------------------------
+def kmeans(vectors, n_lists, seed=SEED):
+
+    rng = np.random.default_rng(seed)
+
+    sample = vectors
+    if len(vectors) > KMEANS_SAMPLE:
+        sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE, replace=False)]
+
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERS):
+
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+
+        for c in range(n_lists):
+            members = sample[nearest == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+
+        centroids = normalize_rows(centroids)
+
+    return centroids.astype(np.float32)
+
+
+def inverted_lists(vectors, centroids):
+
+    nearest = np.argmax(vectors @ centroids.T, axis=1)
+
+    rows = np.argsort(nearest, kind="stable").astype(np.int64)
+
+    offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(nearest, minlength=len(centroids)), out=offsets[1:])
+
+    return offsets, rows
+
+
+# -----------------------------
+# ON DISK
+# manifest.json -> the current model (.npz) and
+# generation directory (ids, hashes, vectors, IVF);
+# a sync writes a new generation and swaps the
+# manifest, readers never see a half-written one
+# -----------------------------
+GENERATION_FILES = ("ids", "hashes", "vectors", "centroids", "offsets", "rows")
+
+
+EMPTY_MANIFEST = {"model": None, "generation": None, "next": 0}
+
+
+class EmbeddingIndex:
+
+    def __init__(self, path=INDEX_DIR):
+
+        require_numpy("the embedding index")
+
+        self.path = path
+        self.manifest = read_manifest(path, EMPTY_MANIFEST)
+        self.model = None
+
+        if self.manifest["model"]:
+            with np.load(os.path.join(path, self.manifest["model"])) as model:
+                self.model = {name: model[name] for name in model.files}
+
+        if self.manifest["generation"]:
+            generation = os.path.join(path, self.manifest["generation"])
+            for name in GENERATION_FILES:
+                setattr(self, name, load_array(os.path.join(generation, name + ".npy")))
+        else:
+            self.ids = np.empty(0, dtype=np.int64)
+            self.hashes = np.empty(0, dtype="<U64")
+            self.vectors = np.empty((0, DIMS), dtype=np.float32)
+            self.centroids = np.empty((0, DIMS), dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            self.rows = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def embed(self, text):
+        return embed(self.model, [text])[0]
+
+    def similarities(self, text):
+
+        # cosine similarity of every indexed portfolio to the text (exact)
+        if not len(self.ids) or self.model is None:
+            return np.empty(0, dtype=np.float32)
+
+        return np.asarray(self.vectors) @ self.embed(text)
+
+    def search(self, text, k=10, nprobe=NPROBE, exact=False):
+
+        # [(portfolio id, cosine similarity)], best first
+        if not len(self.ids) or self.model is None:
+            return []
+
+        query = self.embed(text)
+
+        if exact or len(self.centroids) <= nprobe:
+            rows = np.arange(len(self.ids))
+        else:
+            probe = np.argsort(-(self.centroids @ query))[:nprobe]
+            rows = np.concatenate([
+                self.rows[self.offsets[c]:self.offsets[c + 1]] for c in probe
+            ])
+
+        sims = np.asarray(self.vectors[rows]) @ query
+
+        k = min(k, len(rows))
+        best = np.argpartition(-sims, k - 1)[:k]
+        best = best[np.argsort(-sims[best], kind="stable")]
+
+        return [(int(self.ids[rows[i]]), float(sims[i])) for i in best]
+
+
+def save_generation(path, name, arrays):
+
+    target = os.path.join(path, name)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for array_name in GENERATION_FILES:
+        np.save(os.path.join(tmp, array_name + ".npy"), arrays[array_name])
+
+    os.rename(tmp, target)
+
+
+# -----------------------------
+# DATABASE SYNC
+# embeds new/changed portfolios with the current
+# model (refits it when missing, asked for, or the
+# corpus has grown REFIT_GROWTH times) and rebuilds
+# the IVF lists
+# -----------------------------
+async def fetch_texts(conn, ids):
+    rows = await conn.fetch("""
+        SELECT id, cleaned_data
+        FROM portfolios
+        WHERE id = ANY($1::int[]);
+    """, ids)
+    return {r["id"]: r["cleaned_data"] for r in rows}
+
+
+def corpus_size(model):
+    # models saved before corpus_size existed only know their sample
+    size = model.get("corpus_size", model["fitted_on"])
+    return int(size)
+
+
+async def sync_embeddings(conn, path=INDEX_DIR, refit=False):
+
+    require_numpy("the embedding index")
+
+    os.makedirs(path, exist_ok=True)
+
+    current = await fetch_content_hashes(conn)
+
+    with locked(path):
+
+        index = EmbeddingIndex(path)
+        manifest = index.manifest
+
+        model = index.model
+        model_name = manifest["model"]
+
+        # growth is measured against the corpus at fit time, not
+        # the (FIT_SAMPLE-capped) number of texts fitted on
+        refit = (
+            refit
+            or model is None
+            or len(current) >= REFIT_GROWTH * max(corpus_size(model), 1)
+        )
+
+        if refit and current:
+
+            # random sample (seeded) of the corpus to fit on
+            sample = list(current)
+            if len(sample) > FIT_SAMPLE:
+                rng = np.random.default_rng(SEED)
+                sample = rng.choice(sample, FIT_SAMPLE, replace=False).tolist()
+
+            texts = []
+            for start in range(0, len(sample), SYNC_BATCH):
+                batch = await fetch_texts(conn, sample[start:start + SYNC_BATCH])
+                texts.extend(batch.values())
+
+            model = await asyncio.to_thread(fit_model, texts)
+            model["corpus_size"] = np.array(len(current))
+            model_name = f"model_{manifest['next']:06d}.npz"
+            np.savez(os.path.join(path, model_name), **model)
+
+            print(f"🧮 Embedding model fitted on {len(texts)} portfolios ({model['projection'].shape[1]} dims)")
+
+        if model is None:
+            return 0, 0
+
+        # a new model invalidates every vector
+        known = {} if refit else dict(zip(index.ids.tolist(), index.hashes.tolist()))
+
+        stale = [pid for pid, h in current.items() if known.get(pid) != h]
+        removed = sum(1 for pid in known if pid not in current)
+
+        if not stale and not removed and not refit:
+            return 0, 0
+
+        # kept vectors from the current generation, new ones appended
+        keep = [
+            i for i, pid in enumerate(index.ids.tolist())
+            if not refit and pid in current and known.get(pid) == current[pid]
+        ]
+
+        ids = [int(index.ids[i]) for i in keep]
+        vectors = [np.asarray(index.vectors[keep], dtype=np.float32)] if keep else []
+
+        embedder = Embedder(model, len(stale))
+
+        try:
+            for start in range(0, len(stale), SYNC_BATCH):
+                batch = await fetch_texts(conn, stale[start:start + SYNC_BATCH])
+                ids.extend(batch)
+                vectors.append(await asyncio.to_thread(embedder.embed, list(batch.values())))
+        finally:
+            embedder.close()
+
+        dims = model["projection"].shape[1]
+        vectors = np.concatenate(vectors) if vectors else np.empty((0, dims), dtype=np.float32)
+
+        # centroids are reused until the model or the list count changes
+        n_lists = max(1, min(int(math.sqrt(len(ids))), len(ids)))
+
+        if not refit and len(index.centroids) == n_lists and n_lists:
+            centroids = np.asarray(index.centroids)
+        elif len(ids):
+            centroids = await asyncio.to_thread(kmeans, vectors, n_lists)
+        else:
+            centroids = np.empty((0, dims), dtype=np.float32)
+
+        offsets, rows = (
+            inverted_lists(vectors, centroids)
+            if len(ids) else (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+        )
+
+        generation = f"gen_{manifest['next']:06d}"
+
+        save_generation(path, generation, {
+            "ids": np.array(ids, dtype=np.int64),
+            "hashes": np.array([current[pid] for pid in ids], dtype="<U64"),
+            "vectors": vectors,
+            "centroids": centroids,
+            "offsets": offsets,
+            "rows": rows,
+        })
+
+        old_generation, old_model = manifest["generation"], manifest["model"]
+
+        write_manifest(path, {
+            "model": model_name,
+            "generation": generation,
+            "next": manifest["next"] + 1,
+        })
+
+        if old_generation:
+            shutil.rmtree(os.path.join(path, old_generation), ignore_errors=True)
+
+        if old_model and old_model != model_name:
+            os.remove(os.path.join(path, old_model))
+
+    return len(stale), removed
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+async def main():
+
+    parser = argparse.ArgumentParser(description="Local embedding index over scraped portfolios")
+    parser.add_argument("--index", default=INDEX_DIR, metavar="DIR")
+    parser.add_argument("--sync", action="store_true", help="embed new/changed portfolios")
+    parser.add_argument("--refit", action="store_true", help="refit the model, re-embed everything")
+    parser.add_argument("--query", help="text to find similar portfolios for")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--exact", action="store_true", help="scan every vector instead of IVF lists")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+
+    try:
+        if args.sync or args.refit:
+            embedded, removed = await sync_embeddings(conn, args.index, refit=args.refit)
+            print(f"🧭 Embedding index: {embedded} embedded, {removed} removed")
+
+        if not args.query:
+            return
+
+        index = EmbeddingIndex(args.index)
+
+        started = time.perf_counter()
+        top = index.search(args.query, args.top, exact=args.exact)
+        took_ms = (time.perf_counter() - started) * 1000
+
+        names = {
+            r["id"]: r["candidate_name"]
+            for r in await conn.fetch("""
+                SELECT id, candidate_name FROM portfolios WHERE id = ANY($1::int[]);
+            """, [pid for pid, _ in top])
+        }
+
+    finally:
+        await conn.close()
+
+    print(f"\n🔎 top {len(top)} of {len(index)} portfolios in {took_ms:.1f} ms\n")
+
+    for i, (pid, sim) in enumerate(top, start=1):
+        print(f"{i}. {names.get(pid, pid)} → {sim:.3f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+import re
+
+# -----------------------------
+# PARSER BACKENDS
+# fastest available C parser wins,
+# bs4 is the pure python fallback
+# -----------------------------
+AVAILABLE = []
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+    AVAILABLE.append("selectolax")
+except ImportError:
+    pass
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+    AVAILABLE.append("lxml")
+except ImportError:
+    pass
+
+try:
+    from bs4 import BeautifulSoup
+    AVAILABLE.append("bs4")
+except ImportError:
+    pass
+
+BACKEND = AVAILABLE[0] if AVAILABLE else None
+
+
+# REMOVE ONLY TRUE JUNK
+JUNK_TAGS = ["script", "style", "noscript"]
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def squash(text):
+    return WHITESPACE.sub(" ", text).strip()
+
+
+# -----------------------------
+# SELECTOLAX
+# -----------------------------
+def _parse_selectolax(html):
+
+    tree = HTMLParser(html)
+    tree.strip_tags(JUNK_TAGS)
+
+    links = [
+        (a.attributes.get("href") or "", squash(a.text(separator=" ")))
+        for a in tree.css("a[href]")
+    ]
+
+    root = tree.root
+    text = root.text(separator=" ", strip=True) if root else ""
+
+    # empty text nodes leave runs of separators behind
+    return re.sub(r" {2,}", " ", text), links
+
+
+# -----------------------------
+# LXML
+# -----------------------------
+def _parse_lxml(html):
+
+    try:
+        doc = lxml.html.fromstring(html)
+    except ValueError:
+        # str input with an <?xml encoding=...?> declaration
+        doc = lxml.html.fromstring(html.encode("utf-8"))
+    except ParserError:
+        return "", []
+
+    for el in list(doc.iter(*JUNK_TAGS)):
+        el.drop_tree()
+
+    links = [
+        (a.get("href"), squash(a.text_content()))
+        for a in doc.iter("a")
+        if a.get("href") is not None
+    ]
+
+    parts = (t.strip() for t in doc.xpath("//text()"))
+
+    return " ".join(p for p in parts if p), links
+
+
+# -----------------------------
+# BS4 (pure python fallback)
+# -----------------------------
+def _parse_bs4(html):
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(JUNK_TAGS):
+        tag.extract()
+
+    links = [
+        (a["href"], squash(a.get_text(separator=" ")))
+        for a in soup.find_all("a", href=True)
+    ]
+
+    return soup.get_text(separator=" ", strip=True), links
+
+
+PARSERS = {
+    "selectolax": _parse_selectolax,
+    "lxml": _parse_lxml,
+    "bs4": _parse_bs4,
+}
+
+
+# -----------------------------
+# PARSE ONCE
+# returns (cleaned text, [(href, anchor text)])
+# hrefs are raw: resolving + filtering is the crawler's job
+# -----------------------------
+def parse_page(html, backend=None):
+
+    if not html:
+        return "", []
+
+    backend = backend or BACKEND
+
+    if backend not in AVAILABLE:
+        raise RuntimeError(
+            f"HTML parser '{backend}' is not installed "
+            "(pip install selectolax, lxml or beautifulsoup4)"
+        )
+
+    return PARSERS[backend](html)
@@ -0,0 +1,174 @@
+import re
+
+# bump when matching semantics change: scores from an
+# older matcher are then treated as stale by agent2
+VERSION = 1
+
+# -----------------------------
+# SHARED TERM MATCHER
+# every term of every rubric compiled once and
+# checked once per text, whole words only
+# ("ai" is not in "said", "sql" is not in "mysql")
+# -----------------------------
+
+# multi-word terms match across any single space/hyphen/newline
+# (same length mapping: offsets stay valid for the original text)
+SEPARATORS = str.maketrans({"-": " ", "\n": " ", "\r": " ", "\t": " "})
+
+GAP = re.compile(r"[\s\-]+")
+
+# substring hits checked in place before falling back to a regex scan
+FIND_TRIES = 4
+
+# ASCII text with every non-word char mapped to a space: a whole-word
+# hit is then a term between two spaces, found for all single-word
+# terms in one regex pass (a trie of the terms, anchored on the space)
+ASCII_GAPS = str.maketrans({
+    chr(i): " " for i in range(128)
+    if not (chr(i).isalnum() or chr(i) == "_")
+})
+
+WORD = re.compile(r"\w+")
+
+# the single pass reads the whole text, a find per term stops at its
+# first hit: one pass only wins for big rubrics (bench_matcher.py)
+SINGLE_PASS_MIN_TERMS = 40
+
+
+def normalize_term(term):
+    return GAP.sub(" ", term.strip().lower())
+
+
+def prepare(text):
+    return text.lower().translate(SEPARATORS)
+
+
+def term_pattern(term):
+
+    # the literal comes first so re can jump between candidate
+    # offsets with its fast prefix search; the boundary checks
+    # run only where the literal already matched. optional
+    # plural: "apis", "projects"
+    escaped = re.escape(term)
+    return re.compile(escaped + r"(?<!\w" + escaped + r")s?(?!\w)")
+
+
+def trie_pattern(words):
+
+    # "api", "apis", "aws" -> a(?:pi(?:s)?|ws): at each position the
+    # regex follows one branch instead of trying every term
+    trie = {}
+
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+
+        branches = [re.escape(ch) + build(node[ch]) for ch in sorted(node) if ch]
+
+        if not branches:
+            return ""
+
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+        if "" not in node:
+            return body
+
+        return ("(?:" + body + ")" if len(branches) == 1 else body) + "?"
+
+    return build(trie)
+
+
+class SkillMatcher:
+
+    def __init__(self, terms, single_pass=None):
+        self.terms = sorted({normalize_term(t) for t in terms if t.strip()})
+        self.patterns = [(term, term_pattern(term)) for term in self.terms]
+
+        words = {term for term in self.terms if WORD.fullmatch(term)}
+
+        # None: one pass when there are enough single-word terms
+        if single_pass is None:
+            single_pass = len(words) >= SINGLE_PASS_MIN_TERMS
+
+        self.single_pass = None
+
+        if single_pass and words:
+
+            # the space after a word is looked at, not consumed: it
+            # is the space before the next one
+            self.single_pass = re.compile(" (" + trie_pattern(words) + "s?)(?= )")
+
+            # matched word -> terms it is a hit for ("apis" -> api, apis)
+            self.owners = {}
+            for term in words:
+                self.owners.setdefault(term, []).append(term)
+                self.owners.setdefault(term + "s", []).append(term)
+
+            # multi-word terms and terms like "c++" keep a find each
+            self.rest = [(t, p) for t, p in self.patterns if t not in words]
+
+    def present(self, text):
+
+        # set of terms with at least one whole-word hit: stops at
+        # the first hit per term, all scoring needs
+        if not text:
+            return set()
+
+        low = prepare(text)
+        found = set()
+        patterns = self.patterns
+
+        # str.isascii() is O(1); other text takes the find per term
+        if self.single_pass and low.isascii():
+
+            gapped = " " + low.translate(ASCII_GAPS) + " "
+
+            for word in set(self.single_pass.findall(gapped)):
+                found.update(self.owners[word])
+
+            patterns = self.rest
+
+        for term, pattern in patterns:
+
+            # str.find is far faster than a regex scan: check the
+            # first few substring hits in place, and only hand the
+            # rest of the text to the regex for terms that keep
+            # hitting inside other words
+            pos = low.find(term)
+
+            for _ in range(FIND_TRIES):
+                if pos == -1:
+                    break
+                if pattern.match(low, pos):
+                    found.add(term)
+                    break
+                pos = low.find(term, pos + 1)
+            else:
+                if pos != -1 and pattern.search(low, pos):
+                    found.add(term)
+
+        return found
+
+    def scan(self, text):
+
+        # term -> [start offsets] of every whole-word hit
+        if not text:
+            return {}
+
+        low = prepare(text)
+        hits = {}
+
+        for term, pattern in self.patterns:
+            if term in low:
+                starts = [m.start() for m in pattern.finditer(low)]
+                if starts:
+                    hits[term] = starts
+
+        return hits
+
+    def counts(self, text):
+        return {term: len(starts) for term, starts in self.scan(text).items()}
@@ -0,0 +1,419 @@
+import os
+import json
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import matcher
+from matcher import SkillMatcher, normalize_term
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # falls back to scoring candidate by candidate
+
+# -----------------------------
+# ROLE RUBRICS
+# skills, weights and bonus signals per role live in
+# the roles table; these are the seed rows (dbsetup)
+# and the fallback while the table has no rows
+# -----------------------------
+DEFAULT_BONUS = [
+    [["project"], 8],
+    [["experience"], 6],
+    [["github"], 4],
+    [["deployed", "production"], 6],
+]
+
+DEFAULT_ROLES = {
+
+    "backend": {
+        "must_have": [
+            "python", "fastapi", "django", "node",
+            "sql", "mongodb", "api", "backend",
+        ],
+        "good_to_have": [
+            "docker", "kubernetes", "aws",
+            "redis", "postgres", "microservices",
+        ],
+        "must_weight": 12,
+        "good_weight": 5,
+        "bonus": DEFAULT_BONUS,
+    },
+
+    "ai": {
+        "must_have": [
+            "python", "machine learning", "deep learning", "llm",
+            "tensorflow", "pytorch", "ai",
+        ],
+        "good_to_have": [
+            "rag", "vector database", "transformers",
+            "nlp", "computer vision", "genai",
+        ],
+        "must_weight": 12,
+        "good_weight": 5,
+        "bonus": DEFAULT_BONUS,
+    },
+}
+
+# matching is the CPU-bound part: big batches fan out. kept
+# below agent2.SCORE_BATCH so every full scoring batch does
+PARALLEL_MIN_TEXTS = 1000
+CHUNK_TEXTS = 250
+
+
+def role_version(spec):
+
+    # changes whenever the role's rubric or the matching semantics do
+    payload = json.dumps(
+        {"spec": spec, "matcher": matcher.VERSION},
+        sort_keys=True
+    )
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def clean_terms(terms, taken=()):
+
+    # normalized, non-blank, first occurrence wins
+    seen = set(taken)
+    cleaned = []
+
+    for term in terms or []:
+        if not isinstance(term, str):
+            continue
+
+        term = normalize_term(term)
+
+        if term and term not in seen:
+            seen.add(term)
+            cleaned.append(term)
+
+    return cleaned
+
+
+def clean_spec(spec):
+
+    # score() and the weight matrix must see the same term lists:
+    # "Python" and "python" are one skill, counted once, and a
+    # skill listed as both must-have and good-to-have is a must-have
+    must_have = clean_terms(spec["must_have"])
+    good_to_have = clean_terms(spec["good_to_have"], must_have)
+
+    bonus = [
+        [terms, points]
+        for terms, points in (
+            (clean_terms(group), points) for group, points in spec["bonus"]
+        )
+        if terms
+    ]
+
+    return dict(
+        spec,
+        must_have=must_have,
+        good_to_have=good_to_have,
+        bonus=bonus
+    )
+
+
+def spec_from_row(row):
+    return clean_spec({
+        "must_have": list(row["must_have"] or []),
+        "good_to_have": list(row["good_to_have"] or []),
+        "must_weight": row["must_weight"],
+        "good_weight": row["good_weight"],
+        "bonus": json.loads(row["bonus"] or "[]"),
+    })
+
+
+# -----------------------------
+# PARALLEL MATCHING
+# spawned workers build their own matcher once
+# from the term list instead of importing a global
+# -----------------------------
+_worker_matcher = None
+
+
+def _init_worker(terms):
+    global _worker_matcher
+    _worker_matcher = SkillMatcher(terms)
+
+
+def _present_chunk(texts):
+    return [_worker_matcher.present(text) for text in texts]
+
+
+# -----------------------------
+# COMPILED RUBRIC
+# one matcher over every term of every role, plus
+# the NumPy weight matrices, built once per version
+# -----------------------------
+class Rubric:
+
+    def __init__(self, roles):
+
+        self.roles = {name: clean_spec(spec) for name, spec in roles.items()}
+        self.names = list(roles)
+        self.versions = {name: role_version(spec) for name, spec in self.roles.items()}
+
+        self.version = hashlib.sha256(
+            json.dumps(self.versions, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+
+        self.matcher = SkillMatcher(
+            [
+                term
+                for spec in self.roles.values()
+                for term in (
+                    spec["must_have"] +
+                    spec["good_to_have"] +
+                    [t for terms, _ in spec["bonus"] for t in terms]
+                )
+            ]
+        )
+
+        self._subsets = {}
+        self._weights = None
+
+    def subset(self, names):
+
+        # the roles a backfill actually needs: fewer terms to match
+        key = tuple(sorted(names))
+
+        if key == tuple(sorted(self.names)):
+            return self
+
+        if key not in self._subsets:
+            self._subsets[key] = Rubric({name: self.roles[name] for name in key})
+
+        return self._subsets[key]
+
+    # -----------------------------
+    # PER CANDIDATE
+    # -----------------------------
+    def score(self, cleaned_text, role, hits=None):
+
+        if not cleaned_text:
+            return 0
+
+        # terms present in the text; pass it in to score every role from one check
+        if hits is None:
+            hits = self.matcher.present(cleaned_text)
+
+        spec = self.roles[role]
+
+        score = sum(
+            spec["must_weight"] for s in spec["must_have"] if normalize_term(s) in hits
+        )
+        score += sum(
+            spec["good_weight"] for s in spec["good_to_have"] if normalize_term(s) in hits
+        )
+
+        # a bonus group scores once if any of its terms hit
+        score += sum(
+            points for terms, points in spec["bonus"]
+            if any(normalize_term(t) in hits for t in terms)
+        )
+
+        max_score = (
+            len(spec["must_have"]) * spec["must_weight"] +
+            len(spec["good_to_have"]) * spec["good_weight"] +
+            sum(points for _, points in spec["bonus"])
+        )
+
+        if not max_score:
+            return 0
+
+        return round((score / max_score) * 100, 2)
+
+    def score_roles(self, cleaned_text):
+
+        hits = self.matcher.present(cleaned_text)
+
+        return {
+            role: self.score(cleaned_text, role, hits)
+            for role in self.names
+        }
+
+    # -----------------------------
+    # BATCH (NumPy)
+    # candidates x terms hit matrix, built in one
+    # pass over the corpus, times a terms x roles
+    # weight matrix: a new role is one more column
+    # -----------------------------
+    def weights(self):
+
+        if self._weights is not None:
+            return self._weights
+
+        column = {term: i for i, term in enumerate(self.matcher.terms)}
+
+        weights = np.zeros((len(column), len(self.names)))
+
+        # bonus groups of every role side by side; group_role maps
+        # each group's points back onto its role's column
+        groups = [
+            (j, terms, points)
+            for j, role in enumerate(self.names)
+            for terms, points in self.roles[role]["bonus"]
+        ]
+
+        bonus_terms = np.zeros((len(column), len(groups)))
+        bonus_points = np.array([points for _, _, points in groups], dtype=float)
+        group_role = np.zeros((len(groups), len(self.names)))
+
+        for j, role in enumerate(self.names):
+            spec = self.roles[role]
+            for skill in spec["must_have"]:
+                weights[column[normalize_term(skill)], j] = spec["must_weight"]
+            for skill in spec["good_to_have"]:
+                weights[column[normalize_term(skill)], j] = spec["good_weight"]
+
+        for g, (j, terms, _) in enumerate(groups):
+            group_role[g, j] = 1
+            for term in terms:
+                bonus_terms[column[normalize_term(term)], g] = 1
+
+        max_scores = weights.sum(axis=0) + bonus_points @ group_role
+
+        self._weights = (column, weights, bonus_terms, bonus_points, group_role, max_scores)
+
+        return self._weights
+
+    def match_all(self, texts):
+
+        processes = os.cpu_count() or 1
+
+        if len(texts) < PARALLEL_MIN_TEXTS or processes == 1:
+            return [self.matcher.present(text) for text in texts]
+
+        chunks = [
+            texts[i:i + CHUNK_TEXTS]
+            for i in range(0, len(texts), CHUNK_TEXTS)
+        ]
+
+        with ProcessPoolExecutor(
+            processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.matcher.terms,)
+        ) as executor:
+            return [found for part in executor.map(_present_chunk, chunks) for found in part]
+
+    def hit_matrix(self, texts, column):
+
+        # sparse (row, col) pairs first, one dense 0/1 matrix at the end
+        rows, cols = [], []
+
+        for i, found in enumerate(self.match_all(texts)):
+            for term in found:
+                rows.append(i)
+                cols.append(column[term])
+
+        hits = np.zeros((len(texts), len(column)))
+        hits[rows, cols] = 1
+
+        return hits
+
+    def score_batch(self, texts):
+
+        # role -> [score per text], same numbers as score()
+        if np is None:
+            per_text = [self.score_roles(text) for text in texts]
+            return {
+                role: [scores[role] for scores in per_text]
+                for role in self.names
+            }
+
+        column, weights, bonus_terms, bonus_points, group_role, max_scores = self.weights()
+
+        hits = self.hit_matrix(texts, column)
+
+        bonus = (((hits @ bonus_terms) > 0) * bonus_points) @ group_role
+        totals = hits @ weights + bonus
+
+        # a role with nothing to score stays at 0 instead of dividing by 0
+        scores = np.divide(
+            totals * 100, max_scores,
+            out=np.zeros_like(totals),
+            where=max_scores > 0
+        )
+
+        # empty texts score 0 like score() does
+        empty = np.array([not text for text in texts], dtype=bool)
+        scores[empty] = 0
+
+        return {
+            role: [round(float(s), 2) for s in scores[:, j]]
+            for j, role in enumerate(self.names)
+        }
+
+
+# -----------------------------
+# HOT-RELOADING REGISTRY
+# the roles table is a handful of rows: re-read it
+# on every get() and recompile only when a role's
+# version changes
+# -----------------------------
+class RubricCache:
+
+    def __init__(self):
+        self.rubric = None
+
+    async def load_roles(self, conn):
+
+        rows = await conn.fetch("""
+            SELECT name,
+                   must_have,
+                   good_to_have,
+                   must_weight,
+                   good_weight,
+                   bonus::text AS bonus,
+                   active
+            FROM roles
+            ORDER BY name;
+        """)
+
+        # defaults only for a table never seeded: retiring
+        # every role must not bring the built-in ones back
+        if not rows:
+            return {name: clean_spec(spec) for name, spec in DEFAULT_ROLES.items()}
+
+        return {row["name"]: spec_from_row(row) for row in rows if row["active"]}
+
+    async def get(self, conn):
+
+        roles = await self.load_roles(conn)
+        versions = {name: role_version(spec) for name, spec in roles.items()}
+
+        if self.rubric is None or self.rubric.versions != versions:
+
+            previous = self.rubric
+            self.rubric = Rubric(roles)
+
+            if previous is not None:
+                print(f"🔁 Rubric reloaded: {previous.version} → {self.rubric.version}")
+
+        return self.rubric
+
+
+# -----------------------------
+# ROLE QUERIES
+# free-text description of a role for the rankers
+# (agent2 --bm25, agent3 --prefilter)
+# -----------------------------
+async def fetch_job_descriptions(conn):
+
+    rows = await conn.fetch("""
+        SELECT name, jd
+        FROM roles
+        WHERE active
+          AND jd IS NOT NULL;
+    """)
+
+    return {r["name"]: r["jd"] for r in rows}
+
+
+def role_query(spec, jd):
+    # no job description yet: the rubric's skills, must-haves counted twice
+    return jd or " ".join(spec["must_have"] * 2 + spec["good_to_have"])
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+    "database": os.getenv("DB_NAME"),
+    "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT"),
+}
+
+# -----------------------------
+# FULL-TEXT SKILL SEARCH
+# portfolios.search_tsv is a generated tsvector over
+# the name + scraped text with a GIN index (dbsetup),
+# so a query touches only the matching rows
+# -----------------------------
+
+# text search configuration of the generated column; queries must use the same
+SEARCH_CONFIG = "english"
+
+# websearch: kafka rust / "machine learning" / kafka or spark / -php
+# tsquery:   raw to_tsquery syntax, e.g. kube:* & (rust | go)
+QUERY_PARSERS = {
+    "websearch": "websearch_to_tsquery",
+    "tsquery": "to_tsquery",
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+
+HEADLINE_OPTIONS = "MaxFragments=2, MinWords=5, MaxWords=15, FragmentDelimiter=\" ... \""
+
+
+async def search_portfolios(conn, query, limit=DEFAULT_LIMIT, offset=0, mode="websearch"):
+
+    # ranked matches, best first: cover density rank (terms close
+    # together score higher), normalized by document length so long
+    # portfolios do not win on size alone
+    parser = QUERY_PARSERS[mode]
+    limit = max(1, min(limit, MAX_LIMIT))
+    offset = max(0, offset)
+
+    # headlines re-parse the raw text, so only for the page returned
+    return await conn.fetch(f"""
+        WITH hits AS (
+            SELECT p.id,
+                   ts_rank_cd(p.search_tsv, q, 1) AS rank,
+                   q
+            FROM portfolios p,
+                 {parser}('{SEARCH_CONFIG}', $1) q
+            WHERE p.search_tsv @@ q
+            ORDER BY rank DESC, p.id
+            LIMIT $2 OFFSET $3
+        )
+        SELECT p.id,
+               p.candidate_name,
+               p.portfolio_url,
+               p.status,
+               p.backend_score,
+               p.ai_score,
+               p.shortlist_status,
+               h.rank,
+               ts_headline(
+                   '{SEARCH_CONFIG}',
+                   COALESCE(p.cleaned_data, ''),
+                   h.q,
+                   '{HEADLINE_OPTIONS}'
+               ) AS snippet
+        FROM hits h
+        JOIN portfolios p ON p.id = h.id
+        ORDER BY h.rank DESC, p.id;
+    """, query, limit, offset)
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+async def main():
+
+    parser = argparse.ArgumentParser(description="Full-text search over scraped portfolios")
+    parser.add_argument("query", help='e.g. kafka rust, "machine learning" -php')
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--mode", choices=sorted(QUERY_PARSERS), default="websearch")
+    args = parser.parse_args()
+
+    conn = await asyncpg.connect(**DB_CONFIG)
+
+    try:
+        started = time.perf_counter()
+        rows = await search_portfolios(conn, args.query, args.limit, mode=args.mode)
+        took_ms = (time.perf_counter() - started) * 1000
+    except asyncpg.PostgresSyntaxError as e:
+        print(f"❌ Bad query: {e}")
+        sys.exit(1)
+    finally:
+        await conn.close()
+
+    print(f"\n🔎 {len(rows)} matches for {args.query!r} in {took_ms:.1f} ms\n")
+
+    for i, r in enumerate(rows, start=1):
+        print(f"{i}. {r['candidate_name']} (rank {r['rank']:.3f}) → {r['portfolio_url']}")
+        print(f"   {r['snippet']}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+import zlib
+import hashlib
+
+# -----------------------------
+# COMPRESSION CODECS
+# zstd when installed, zlib (stdlib) otherwise;
+# the codec is stored with every blob so both
+# can be read back regardless of what wrote them
+# -----------------------------
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODEC = "zstd" if zstandard else "zlib"
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def snapshot_hash(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def compress(html, codec=None):
+
+    codec = codec or CODEC
+    raw = html.encode("utf-8")
+
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec, data):
+
+    if codec == "zstd":
+        if not zstandard:
+            raise RuntimeError(
+                "snapshot is zstd-compressed (pip install zstandard)"
+            )
+        raw = zstandard.ZstdDecompressor().decompress(data)
+
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+
+    else:
+        raise RuntimeError(f"unknown snapshot codec '{codec}'")
+
+    return raw.decode("utf-8")
+
+
+# -----------------------------
+# SNAPSHOT STORE (html_snapshots table)
+# content-addressed: identical HTML across pages,
+# portfolios and re-crawls is stored once
+# -----------------------------
+async def save_snapshots(conn, pages):
+
+    blobs = {}
+
+    for page in pages:
+        if page.get("html"):
+            digest = snapshot_hash(page["html"])
+            page["html_hash"] = digest
+
+            if digest not in blobs:
+                blobs[digest] = page["html"]
+
+    if not blobs:
+        return 0
+
+    known = await conn.fetch("""
+        SELECT hash FROM html_snapshots WHERE hash = ANY($1);
+    """, list(blobs))
+
+    for row in known:
+        del blobs[row["hash"]]
+
+    await conn.executemany("""
+        INSERT INTO html_snapshots (hash, codec, raw_size, data)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (hash) DO NOTHING;
+    """, [
+        (digest, CODEC, len(html.encode("utf-8")), compress(html))
+        for digest, html in blobs.items()
+    ])
+
+    return len(blobs)
+
+
+async def prune_snapshots(conn, hashes=None):
+
+    # blobs no crawl_pages row points at any more; with hashes,
+    # only those (the ones a re-crawl just replaced) are checked
+    if hashes is None:
+        result = await conn.execute("""
+            DELETE FROM html_snapshots s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM crawl_pages cp WHERE cp.html_hash = s.hash
+            );
+        """)
+    elif hashes:
+        result = await conn.execute("""
+            DELETE FROM html_snapshots s
+            WHERE s.hash = ANY($1)
+              AND NOT EXISTS (
+                SELECT 1 FROM crawl_pages cp WHERE cp.html_hash = s.hash
+              );
+        """, list(hashes))
+    else:
+        return 0
+
+    return int(result.split()[-1])
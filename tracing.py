@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+
+# -----------------------------
+# CRAWL TRACING
+# per-phase spans, one JSON object per line.
+# field names follow the OpenTelemetry span model
+# (trace/span ids, unix nano timestamps, attributes)
+# so a file can be replayed into an OTLP collector.
+# off unless a trace file is configured.
+# -----------------------------
+SERVICE_NAME = "agent1"
+
+# current portfolio rollup / enclosing span, per asyncio task
+_rollup = contextvars.ContextVar("trace_rollup", default=None)
+_parent = contextvars.ContextVar("trace_parent", default=None)
+
+
+def new_id(hex_chars):
+    return uuid.uuid4().hex[:hex_chars]
+
+
+class Tracer:
+
+    def __init__(self):
+        self.fd = None
+
+    @property
+    def enabled(self):
+        return self.fd is not None
+
+    def configure(self, path):
+
+        if path and not self.fd:
+            # O_APPEND + one write() per record: lines from
+            # several worker processes never interleave
+            self.fd = os.open(
+                path,
+                os.O_WRONLY | os.O_CREAT | os.O_APPEND,
+                0o644
+            )
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        os.write(self.fd, line.encode("utf-8"))
+
+    def record(self, name, start_ns, end_ns=None, error=None, **attributes):
+
+        if not self.fd:
+            return
+
+        end_ns = end_ns or time.time_ns()
+        rollup = _rollup.get()
+
+        if rollup is not None:
+            phase = rollup["phases"].setdefault(name, {"count": 0, "total_ms": 0.0})
+            phase["count"] += 1
+            phase["total_ms"] += (end_ns - start_ns) / 1e6
+            attributes["portfolio.id"] = rollup["portfolio_id"]
+
+        attributes["service.name"] = SERVICE_NAME
+
+        self._write({
+            "kind": "span",
+            "name": name,
+            "trace_id": rollup["trace_id"] if rollup else new_id(32),
+            "span_id": attributes.pop("_span_id", None) or new_id(16),
+            "parent_span_id": _parent.get(),
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+            "status": "ERROR" if error else "OK",
+            "error": error,
+            "attributes": attributes,
+        })
+
+    @contextmanager
+    def span(self, name, **attributes):
+
+        # disabled: no ids, no clock reads
+        if not self.fd:
+            yield attributes
+            return
+
+        span_id = new_id(16)
+        start_ns = time.time_ns()
+        token = _parent.set(span_id)
+        error = None
+
+        try:
+            # callers may add attributes while the span is open
+            yield attributes
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _parent.reset(token)
+            self.record(
+                name,
+                start_ns,
+                error=error,
+                _span_id=span_id,
+                **attributes
+            )
+
+    @contextmanager
+    def portfolio(self, portfolio_id, url):
+
+        if not self.fd:
+            yield
+            return
+
+        rollup = {
+            "trace_id": new_id(32),
+            "portfolio_id": portfolio_id,
+            "phases": {},
+        }
+
+        token = _rollup.set(rollup)
+        start_ns = time.time_ns()
+
+        try:
+            yield
+        finally:
+            _rollup.reset(token)
+            end_ns = time.time_ns()
+
+            # phases overlap when pages are fetched concurrently,
+            # so their totals can add up to more than duration_ms
+            self._write({
+                "kind": "portfolio",
+                "trace_id": rollup["trace_id"],
+                "portfolio_id": portfolio_id,
+                "url": url,
+                "start_time_unix_nano": start_ns,
+                "end_time_unix_nano": end_ns,
+                "duration_ms": round((end_ns - start_ns) / 1e6, 3),
+                "phases": {
+                    name: {
+                        "count": phase["count"],
+                        "total_ms": round(phase["total_ms"], 3),
+                    }
+                    for name, phase in sorted(rollup["phases"].items())
+                },
+            })
+
+
+tracer = Tracer()